@@ -90,6 +90,9 @@ At retirement, a user-selected percentage of the NPS corpus is converted to an a
 - **UPS Pension:**  
 The UPS pension is computed as 50% of the last drawn basic pay (or as per user’s logic).
 
+- **NPS Annuity Products:**  
+The annuitized corpus is also priced as a life annuity, return of purchase price, joint-life with spouse and an increasing annuity, and each product's payouts are compared side by side with UPS (including the UPS family pension for the spouse years).
+
 - **Corpus and Tables:**  
 The final NPS corpus, UPS monthly pension, and all monthly pay/emoluments values are shown for full transparency.
 
@@ -0,0 +1,192 @@
+# Incremental local mirror of the UPS_Data submissions table, with pre-aggregated rollups
+
+import os
+import sqlite3
+
+import pandas as pd
+
+ANALYTICS_DB = os.environ.get("UPS_NPS_ANALYTICS_DB", "analytics.sqlite3")
+SOURCE_TABLE = "UPS_Data"
+WATERMARK_COLUMN = "id"
+# Ids below the watermark that are fetched again on every sync. Postgres hands out ids before
+# commit, so a row with a lower id can become visible after a higher one has been synced.
+SYNC_LOOKBACK_IDS = 1000
+# Width of the UPS - NPS monthly pension gap histogram buckets (₹)
+GAP_BUCKET = 500
+
+# Supabase column -> local column
+SUBMISSION_COLUMNS = {
+    "id": "id",
+    "created_at": "created_at",
+    "Retirement Age": "retirement_age",
+    "Current Age": "current_age",
+    "Initial Pay Position": "initial_position",
+    "Initial Pay Level": "initial_level",
+    "Average Pay Commission Increase (%)": "pay_comm_increase",
+    "Total NPS Contribution Rate (% of Basic + DA)": "nps_contribution_rate",
+    "NPS Annual Return Rate (%)": "nps_return",
+    "% of Corpus Converted to Annuity": "annuity_pct",
+    "Annual Annuity Rate (%)": "annuity_rate",
+    "Expected Years to Live Beyond Retirement": "life_expectancy_years",
+    "UPS Monthly Pension:": "ups_monthly_pension",
+    "NPS Monthly Pension (Estimated):": "nps_monthly_pension",
+    "Total NPS Corpus at Retirement": "nps_corpus",
+    "UPS Lumpsum :": "ups_lumpsum",
+    "Total UPS Pension": "total_ups_paid",
+    "NPS Lumpsum:": "nps_lumpsum",
+    "Total NPS Annuity": "total_nps_paid",
+}
+DERIVED_COLUMNS = ["gap", "gap_bucket"]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY,
+    {", ".join(c for c in SUBMISSION_COLUMNS.values() if c != "id")},
+    gap REAL,
+    gap_bucket INTEGER
+);
+CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS level_rollup (
+    level INTEGER PRIMARY KEY, n INTEGER NOT NULL, sum_gap REAL NOT NULL, sum_ups REAL NOT NULL, sum_nps REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS gap_histogram (
+    level INTEGER NOT NULL, bucket INTEGER NOT NULL, n INTEGER NOT NULL, PRIMARY KEY (level, bucket)
+);
+CREATE TABLE IF NOT EXISTS nps_return_counts (nps_return_pct REAL PRIMARY KEY, n INTEGER NOT NULL);
+"""
+
+# Each batch is staged in a temporary table; once rows already mirrored are dropped from it,
+# the rollups are folded in from exactly the rows that were inserted
+STAGING = "CREATE TEMP TABLE IF NOT EXISTS incoming AS SELECT * FROM submissions WHERE 0"
+ROLLUP_UPDATES = [
+    """INSERT INTO level_rollup (level, n, sum_gap, sum_ups, sum_nps)
+       SELECT initial_level, COUNT(*), SUM(gap), SUM(ups_monthly_pension), SUM(nps_monthly_pension)
+       FROM incoming WHERE gap IS NOT NULL GROUP BY initial_level
+       ON CONFLICT (level) DO UPDATE SET n = n + excluded.n, sum_gap = sum_gap + excluded.sum_gap,
+           sum_ups = sum_ups + excluded.sum_ups, sum_nps = sum_nps + excluded.sum_nps""",
+    """INSERT INTO gap_histogram (level, bucket, n)
+       SELECT initial_level, gap_bucket, COUNT(*)
+       FROM incoming WHERE gap IS NOT NULL GROUP BY initial_level, gap_bucket
+       ON CONFLICT (level, bucket) DO UPDATE SET n = n + excluded.n""",
+    """INSERT INTO nps_return_counts (nps_return_pct, n)
+       SELECT ROUND(nps_return * 100, 1), COUNT(*)
+       FROM incoming WHERE nps_return IS NOT NULL GROUP BY ROUND(nps_return * 100, 1)
+       ON CONFLICT (nps_return_pct) DO UPDATE SET n = n + excluded.n""",
+]
+
+
+def connect(path=ANALYTICS_DB):
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _state(conn, key):
+    row = conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else 0
+
+
+def _set_state(conn, key, value):
+    conn.execute(
+        "INSERT INTO sync_state (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+        (key, value),
+    )
+
+
+def watermark(conn):
+    return _state(conn, WATERMARK_COLUMN)
+
+
+def submission_count(conn):
+    # Every mirrored row, including those without a pension gap that the level rollup leaves out
+    return _state(conn, "submissions")
+
+
+def _local_row(row):
+    local = [row.get(source) for source in SUBMISSION_COLUMNS]
+    ups, nps = row.get("UPS Monthly Pension:"), row.get("NPS Monthly Pension (Estimated):")
+    gap = ups - nps if ups is not None and nps is not None else None
+    return local + [gap, None if gap is None else int(gap // GAP_BUCKET)]
+
+
+def fetch_batch(client, after, batch_size):
+    return (
+        client.table(SOURCE_TABLE).select("*")
+        .gt(WATERMARK_COLUMN, after).order(WATERMARK_COLUMN).limit(batch_size)
+        .execute().data
+    )
+
+
+def sync_submissions(client, path=ANALYTICS_DB, batch_size=1000, lookback=SYNC_LOOKBACK_IDS):
+    """Copy rows newer than the local watermark, or up to ``lookback`` ids below it, and fold
+    the ones not mirrored yet into the rollups.
+
+    Returns the number of rows added. Each batch is one write transaction, so concurrent
+    syncs from several processes never count a row twice.
+    """
+    columns = list(SUBMISSION_COLUMNS.values()) + DERIVED_COLUMNS
+    stage = f"INSERT OR IGNORE INTO incoming ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    conn = connect(path)
+    added = 0
+    try:
+        conn.execute(STAGING)
+        after = max(watermark(conn) - lookback, 0)
+        while True:
+            rows = fetch_batch(client, after, batch_size)
+            if not rows:
+                break
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM incoming")
+                conn.executemany(stage, [_local_row(r) for r in rows])
+                # Under the write lock, so rows another process synced meanwhile are dropped too
+                conn.execute("DELETE FROM incoming WHERE id IN (SELECT id FROM submissions)")
+                fresh = conn.execute("SELECT COUNT(*) FROM incoming").fetchone()[0]
+                conn.execute("INSERT INTO submissions SELECT * FROM incoming")
+                for statement in ROLLUP_UPDATES:
+                    conn.execute(statement)
+                after = max(r[WATERMARK_COLUMN] for r in rows)
+                _set_state(conn, WATERMARK_COLUMN, max(watermark(conn), after))
+                _set_state(conn, "submissions", conn.execute("SELECT COUNT(*) FROM submissions").fetchone()[0])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            added += fresh
+            if len(rows) < batch_size:
+                break
+    finally:
+        conn.close()
+    return added
+
+
+def level_summary(conn):
+    # Median gap is read off the histogram, accurate to one GAP_BUCKET
+    summary = pd.read_sql_query(
+        "SELECT level, n, sum_gap / n AS mean_gap, sum_ups / n AS mean_ups, sum_nps / n AS mean_nps "
+        "FROM level_rollup ORDER BY level",
+        conn,
+    )
+    histogram = pd.read_sql_query("SELECT level, bucket, n FROM gap_histogram ORDER BY level, bucket", conn)
+    medians = {}
+    for level, buckets in histogram.groupby("level"):
+        cumulative = buckets["n"].cumsum()
+        bucket = buckets["bucket"].iloc[(cumulative >= cumulative.iloc[-1] / 2).argmax()]
+        medians[level] = (bucket + 0.5) * GAP_BUCKET
+    summary.insert(2, "median_gap", summary["level"].map(medians))
+    return summary.rename(columns={
+        "level": "Level",
+        "n": "Submissions",
+        "median_gap": "Median UPS - NPS Gap (₹)",
+        "mean_gap": "Mean UPS - NPS Gap (₹)",
+        "mean_ups": "Mean UPS Pension (₹)",
+        "mean_nps": "Mean NPS Pension (₹)",
+    }).set_index("Level").round()
+
+
+def nps_return_distribution(conn):
+    return pd.read_sql_query(
+        "SELECT nps_return_pct AS 'NPS Return (%)', n AS Submissions FROM nps_return_counts ORDER BY nps_return_pct",
+        conn,
+    ).set_index("NPS Return (%)")
@@ -0,0 +1,74 @@
+# NPS annuity product pricing engine
+
+import numpy as np
+import pandas as pd
+
+# Quoted annual rate of the return-of-purchase-price plan, below the life annuity rate
+ROP_RATE_DISCOUNT = 0.01
+# UPS family pension paid to the spouse, as a share of the retiree's pension
+UPS_FAMILY_PENSION_PCT = 0.6
+
+ANNUITY_PRODUCTS = [
+    "Life Annuity",
+    "Return of Purchase Price",
+    "Joint Life (Spouse)",
+    "Increasing Annuity",
+]
+
+
+def ups_pension_schedule(ups_pension, start_da, months, spouse_months=0):
+    # DA rises 3% every 6 months from the DA% at retirement, same as the UPS pension table
+    steps = np.arange(months + spouse_months) // 6
+    schedule = ups_pension * (1 + start_da + 0.03 * steps)
+    schedule[months:] *= UPS_FAMILY_PENSION_PCT
+    return schedule
+
+
+def annuity_product_schedules(purchase_price, annuity_rate, months, spouse_months=0, step_up=0.03):
+    """Monthly cash flows of every annuity product, one row per entry of ANNUITY_PRODUCTS.
+
+    Joint-life and increasing annuities are priced to the same present value as the
+    life annuity, discounted at the quoted annuity rate.
+    """
+    total_months = months + spouse_months
+    k = np.arange(total_months)
+    discount = (1 + annuity_rate / 12) ** -(k + 1)
+
+    horizons = np.array([months, months, total_months, months])
+    step_ups = np.array([0.0, 0.0, 0.0, step_up])
+    rates = np.array([annuity_rate, annuity_rate - ROP_RATE_DISCOUNT, annuity_rate, annuity_rate])
+    pv_matched = np.array([False, False, True, True])
+
+    alive = k[None, :] < horizons[:, None]
+    shape = (1 + step_ups[:, None]) ** (k[None, :] // 12) * alive
+
+    life_payment = purchase_price * annuity_rate / 12
+    pv_life = life_payment * discount[:months].sum()
+    first_payment = np.where(
+        pv_matched,
+        pv_life / np.maximum(shape @ discount, 1e-12),
+        purchase_price * rates / 12,
+    )
+    cash_flows = first_payment[:, None] * shape
+    # Return of purchase price is paid to the nominee in the last month of the horizon
+    if months > 0:
+        cash_flows[1, months - 1] += purchase_price
+    return cash_flows
+
+
+def compare_with_ups(cash_flows, ups_schedule):
+    table = pd.DataFrame({
+        "Product": ANNUITY_PRODUCTS,
+        "First Monthly Pension (₹)": cash_flows[:, 0].round(),
+        "Total Paid (₹)": cash_flows.sum(axis=1).round(),
+    })
+    table["Gap vs UPS (₹)"] = table["Total Paid (₹)"] - round(ups_schedule.sum())
+    return table
+
+
+def cumulative_payouts(cash_flows, ups_schedule):
+    cumulative = pd.DataFrame(np.cumsum(cash_flows, axis=1).T, columns=ANNUITY_PRODUCTS)
+    cumulative.insert(0, "UPS", np.cumsum(ups_schedule))
+    cumulative.index = cumulative.index + 1
+    cumulative.index.name = "Month"
+    return cumulative
@@ -0,0 +1,10 @@
+# Process-wide clients for optional integrations, created and imported on first use
+
+import streamlit as st
+
+
+@st.cache_resource
+def get_supabase_client():
+    from supabase import create_client
+
+    return create_client(st.secrets["supabase_url"], st.secrets["supabase_key"])
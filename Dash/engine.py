@@ -0,0 +1,426 @@
+# Career and pension simulation engine
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from annuity import ups_pension_schedule
+from paymatrix import BASE_CPC, CPC_ORDER, CPC_YEARS, lookup_basic_pay
+
+
+class ScenarioInputs(NamedTuple):
+    joining_date: pd.Timestamp
+    retirement_age: int
+    current_age: int
+    pay_comm_pct: int
+    initial_level: int
+    initial_position: int
+    date_of_increment: str
+    promotion_interval: int
+    nps_contribution_rate: float
+    nps_return: float
+    annuity_pct: float
+    annuity_rate: float
+    life_expectancy_years: int
+    current_year: int
+
+
+INCREMENT_MONTHS = ("January", "July")
+# Bounds of the Dashboard page widgets, with percentages as fractions
+INPUT_RANGES = {
+    "retirement_age": (58, 65),
+    "current_age": (20, 60),
+    "promotion_interval": (2, 10),
+    "nps_contribution_rate": (0.10, 0.30),
+    "nps_return": (0.05, 0.12),
+    "annuity_pct": (0.40, 0.80),
+    "annuity_rate": (0.05, 0.08),
+    "life_expectancy_years": (1, 50),
+}
+
+# Inputs that shape the pay path from the first month; the pay commission increase only matters
+# from the first CPC switch, and the retirement date only decides where the path stops. NPS
+# inputs never change the pay path, only the corpus recurrence run over its emoluments.
+PAY_PATH_FIELDS = ("joining_date", "initial_level", "initial_position", "date_of_increment", "promotion_interval")
+# Compact per-month pay path kept by CareerCheckpoints, in the order iter_pay_path yields it
+PAY_COLUMNS = {
+    "level": np.int16,
+    "position": np.int16,
+    "cpc_pointer": np.int8,
+    "basic_pay": np.float64,
+    "current_da": np.float64,
+    "da_amount": np.float64,
+    "total_emoluments": np.float64,
+}
+
+
+class CareerTimeline(NamedTuple):
+    months: pd.DatetimeIndex
+    labels: np.ndarray
+    years: np.ndarray
+    service_months: int
+
+
+def career_timeline(inputs):
+    # Month starts from joining to retirement, shared by every run with the same two dates
+    retire_year = inputs.current_year + (inputs.retirement_age - inputs.current_age)
+    return _career_timeline(inputs.joining_date, retire_year)
+
+
+@lru_cache(maxsize=64)
+def _career_timeline(joining_date, retire_year):
+    retire_date = datetime(retire_year, joining_date.month, joining_date.day)
+    months = pd.date_range(start=joining_date, end=retire_date, freq='MS')
+    labels = np.asarray(months.strftime("%b-%Y"), dtype=object)
+    years = months.year.to_numpy(np.int64)
+    labels.flags.writeable = False
+    years.flags.writeable = False
+    # Service duration
+    service_months = (retire_date.year - joining_date.year) * 12 + (retire_date.month - joining_date.month)
+    return CareerTimeline(months, labels, years, service_months)
+
+
+def check_inputs(inputs):
+    # Raises ValueError for inputs the Dashboard page would not offer; pay matrix cells are
+    # checked separately (paymatrix.check_pay_inputs)
+    for field, (low, high) in INPUT_RANGES.items():
+        value = getattr(inputs, field)
+        if not low <= value <= high:
+            raise ValueError(f"{field} must be from {low} to {high}, got {value}")
+    if inputs.date_of_increment not in INCREMENT_MONTHS:
+        raise ValueError(f"date_of_increment must be one of {', '.join(INCREMENT_MONTHS)}, got {inputs.date_of_increment!r}")
+    if career_timeline(inputs).service_months <= 0:
+        raise ValueError(f"retirement at {inputs.retirement_age} falls before joining on {inputs.joining_date.date()}")
+
+
+def collect_rows(rows):
+    # Drains a row generator into a list, along with the value it returns
+    collected = []
+    while True:
+        try:
+            collected.append(next(rows))
+        except StopIteration as stop:
+            return collected, stop.value
+
+
+def iter_pay_path(inputs, pay_matrix_full, unique_levels, start_month=0, start_state=None, snapshots=None,
+                  months=None):
+    """Yield the pay of every month until retirement; return the final pay state.
+
+    Each item is (month, level, position, cpc_pointer, basic_pay, current_da, da_amount,
+    total_emoluments, pay_commission_applied). Starts from ``start_state`` at month index
+    ``start_month`` when given. If ``snapshots`` is a dict, the state before every January
+    (year boundaries and CPC switches) is stored in it under its month index, as is the
+    final state. ``months`` is the career_timeline months, when the caller already has them.
+    """
+    if months is None:
+        months = career_timeline(inputs).months
+    joining_date = inputs.joining_date
+    cpc_years_sorted = [(BASE_CPC, joining_date.year)] + [(cpc, y) for cpc, y in CPC_YEARS.items()]
+    if start_state is None:
+        level = inputs.initial_level
+        position = inputs.initial_position
+        current_cpc = BASE_CPC
+        cpc_pointer = 0
+        basic_pay = lookup_basic_pay(pay_matrix_full, current_cpc, level, position)
+        current_da = 0.0
+    else:
+        level = start_state["level"]
+        position = start_state["position"]
+        current_cpc = start_state["cpc"]
+        cpc_pointer = start_state["cpc_pointer"]
+        basic_pay = start_state["basic_pay"]
+        current_da = start_state["current_da"]
+
+    def state():
+        return {
+            "level": level,
+            "position": position,
+            "cpc": current_cpc,
+            "cpc_pointer": cpc_pointer,
+            "basic_pay": basic_pay,
+            "current_da": current_da,
+        }
+
+    for k in range(start_month, len(months)):
+        month = months[k]
+        if snapshots is not None and month.month == 1:
+            snapshots[k] = state()
+        year = month.year
+        is_jan = month.month == 1
+        is_july = month.month == 7
+        pay_commission_applied = ""
+
+        # Switch CPC if month/year matches new CPC cycle
+        if (cpc_pointer + 1 < len(cpc_years_sorted)) and (year == cpc_years_sorted[cpc_pointer + 1][1]) and is_jan:
+            cpc_pointer += 1
+            current_cpc = cpc_years_sorted[cpc_pointer][0]
+            pay_commission_applied = current_cpc
+            # Fetch new Basic Pay from the new CPC matrix
+            basic_pay_new = lookup_basic_pay(pay_matrix_full, current_cpc, level, position)
+            if basic_pay_new is not None:
+                basic_pay = basic_pay_new
+            # Reset DA after each CPC
+            current_da = 0.0
+
+        # DA increases every Jan and July at 3%
+        if is_jan or is_july:
+            current_da += 0.03
+
+        da_amt = basic_pay * current_da
+        total_emoluments = basic_pay + da_amt
+
+        # Increment
+        if (inputs.date_of_increment == "January" and is_jan) or (inputs.date_of_increment == "July" and is_july):
+            next_position = position + 1
+            new_pay = lookup_basic_pay(pay_matrix_full, current_cpc, level, next_position)
+            if new_pay is not None:
+                basic_pay = new_pay
+                position = next_position
+
+        # Promotion
+        if ((year - joining_date.year) % inputs.promotion_interval == 0 and is_jan and year != joining_date.year):
+            current_index = unique_levels.index(level)
+            if current_index + 1 < len(unique_levels):
+                next_level = unique_levels[current_index + 1]
+                promoted_pay = lookup_basic_pay(pay_matrix_full, current_cpc, next_level, 1)
+                if promoted_pay is not None:
+                    level = next_level
+                    basic_pay = promoted_pay
+                    position = 1
+
+        yield (month, level, position, cpc_pointer, basic_pay, current_da, da_amt, total_emoluments,
+               pay_commission_applied)
+
+    final_state = state()
+    if snapshots is not None:
+        snapshots[len(months)] = final_state
+    return final_state
+
+
+def iter_career(inputs, pay_matrix_full, unique_levels):
+    """Yield one progression record per month until retirement; return the final state."""
+    nps_growth = (1 + inputs.nps_return) ** (1 / 12)
+    nps_corpus = 0.0
+    pay_path = iter_pay_path(inputs, pay_matrix_full, unique_levels)
+    while True:
+        try:
+            (month, level, position, cpc_pointer, basic_pay, current_da, da_amt, total_emoluments,
+             pay_commission_applied) = next(pay_path)
+        except StopIteration as stop:
+            return {**stop.value, "nps_corpus": nps_corpus}
+
+        # NPS corpus
+        monthly_contribution = total_emoluments * inputs.nps_contribution_rate
+        nps_corpus = (nps_corpus + monthly_contribution) * nps_growth
+
+        yield {
+            "Month": month.strftime("%b-%Y"),
+            "Year": month.year,
+            "Level": level,
+            "Position": position,
+            "CPC": CPC_ORDER[cpc_pointer],
+            "Basic Pay": round(basic_pay),
+            "DA Rate": round(current_da, 2),
+            "DA Amount": round(da_amt),
+            "Total Emoluments": round(total_emoluments),
+            "Monthly NPS Contribution": round(monthly_contribution),
+            "NPS Corpus": round(nps_corpus),
+            "Pay Commission Applied": pay_commission_applied
+        }
+
+
+class CareerCheckpoints:
+    """Pay paths of recent runs, so what-if edits resume instead of starting at joining.
+
+    Runs are keyed by PAY_PATH_FIELDS and the pay commission increase, and keep the path as
+    compact PAY_COLUMNS arrays plus pay state snapshots. A snapshot stays valid for new inputs
+    with the same PAY_PATH_FIELDS that run at least as long. Snapshots taken before the first
+    CPC switch do not depend on the pay commission increase; later ones are only reused for
+    the same increase. The NPS corpus is not stored: it is recomputed from the emoluments.
+    """
+
+    def __init__(self, max_runs=64):
+        self.max_runs = max_runs
+        # (path key, pay_comm_pct) -> (PAY_COLUMNS arrays, {month index: pay state before that month})
+        self._runs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resume(self, inputs, n_months):
+        # Latest valid snapshot: (month index, state, pay columns before it, snapshots up to it)
+        path = tuple(getattr(inputs, field) for field in PAY_PATH_FIELDS)
+        best = (0, None, None, {})
+        with self._lock:
+            for (run_path, pay_comm_pct), (columns, snapshots) in self._runs.items():
+                if run_path != path:
+                    continue
+                for k, state in snapshots.items():
+                    same_pay = pay_comm_pct == inputs.pay_comm_pct or state["cpc_pointer"] == 0
+                    if best[0] < k <= n_months and same_pay:
+                        best = (k, state, columns, snapshots)
+        k, state, columns, snapshots = best
+        if columns is None:
+            columns = {name: np.empty(0, dtype) for name, dtype in PAY_COLUMNS.items()}
+        return k, state, {name: column[:k] for name, column in columns.items()}, {
+            j: s for j, s in snapshots.items() if j <= k
+        }
+
+    def save(self, inputs, columns, snapshots):
+        key = (tuple(getattr(inputs, field) for field in PAY_PATH_FIELDS), inputs.pay_comm_pct)
+        n_months = len(columns["level"])
+        with self._lock:
+            stored = self._runs.get(key)
+            # A longer run of the same path already holds this one as its prefix
+            if stored is None or len(stored[0]["level"]) <= n_months:
+                for column in columns.values():
+                    column.flags.writeable = False
+                self._runs[key] = (columns, snapshots)
+            self._runs.move_to_end(key)
+            while len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+
+
+def _career_frame(inputs, timeline, pay):
+    # The records of iter_career, built from a pay path and the NPS recurrence over its emoluments
+    contributions = pay["total_emoluments"] * inputs.nps_contribution_rate
+    nps_growth = (1 + inputs.nps_return) ** (1 / 12)
+    corpus, nps_corpus = [], 0.0
+    for monthly_contribution in contributions.tolist():
+        nps_corpus = (nps_corpus + monthly_contribution) * nps_growth
+        corpus.append(nps_corpus)
+    cpc_names = np.asarray(CPC_ORDER, dtype=object)
+    # Paths always start at joining, in the base CPC; the pointer only moves at a switch
+    switched = np.diff(pay["cpc_pointer"], prepend=0) != 0
+    frame = pd.DataFrame({
+        "Month": timeline.labels,
+        "Year": timeline.years,
+        "Level": pay["level"].astype(np.int64),
+        "Position": pay["position"].astype(np.int64),
+        "CPC": cpc_names[pay["cpc_pointer"]],
+        "Basic Pay": np.rint(pay["basic_pay"]).astype(np.int64),
+        "DA Rate": [round(da, 2) for da in pay["current_da"].tolist()],
+        "DA Amount": np.rint(pay["da_amount"]).astype(np.int64),
+        "Total Emoluments": np.rint(pay["total_emoluments"]).astype(np.int64),
+        "Monthly NPS Contribution": np.rint(contributions).astype(np.int64),
+        "NPS Corpus": np.rint(corpus).astype(np.int64),
+        "Pay Commission Applied": np.where(switched, cpc_names[pay["cpc_pointer"]], ""),
+    })
+    return frame, nps_corpus
+
+
+def simulate_career(inputs, pay_matrix_full, unique_levels, checkpoints=None):
+    # Monthly pay progression until retirement, and the state carried out of the last month
+    if checkpoints is None:
+        records, final_state = collect_rows(iter_career(inputs, pay_matrix_full, unique_levels))
+        return pd.DataFrame(records), final_state
+    timeline = career_timeline(inputs)
+    start_month, start_state, columns, snapshots = checkpoints.resume(inputs, len(timeline.months))
+    rows, pay_state = collect_rows(
+        iter_pay_path(inputs, pay_matrix_full, unique_levels, start_month, start_state, snapshots, timeline.months)
+    )
+    if rows:
+        fields = list(zip(*rows))[1:1 + len(PAY_COLUMNS)]
+        columns = {
+            name: np.concatenate([columns[name], np.asarray(values, dtype)])
+            for (name, dtype), values in zip(PAY_COLUMNS.items(), fields)
+        }
+    checkpoints.save(inputs, columns, snapshots)
+    df, nps_corpus = _career_frame(inputs, timeline, columns)
+    return df, {**pay_state, "nps_corpus": nps_corpus}
+
+
+def iter_ups_pension_rows(ups_pension, last_da_pct, months_retired):
+    # Month-wise UPS pension with DA rising 3% every 6 months; returns the total paid
+    da_pct = last_da_pct
+    total_ups_paid = 0.0
+    for i in range(months_retired):
+        if i % 6 == 0 and i != 0:
+            da_pct += 0.03
+        month_pension = ups_pension * (1 + da_pct)
+        total_ups_paid += month_pension
+        yield {
+            "Month": i + 1,
+            "Pension (₹)": round(month_pension, 2),
+            "DA Rate (%)": round(da_pct * 100, 2),
+            "Cumulative Paid (₹)": round(total_ups_paid, 2)
+        }
+    return total_ups_paid
+
+
+def iter_nps_pension_rows(nps_annuity_corpus, annuity_rate, nps_annuity_growth_rate, months_retired):
+    # Month-wise NPS annuity on a corpus growing at the given annual rate; returns the total paid
+    total_nps_paid = 0.0
+    for i in range(months_retired):
+        nps_annuity_corpus = nps_annuity_corpus * (1 + nps_annuity_growth_rate / 12)
+        nps_monthly_annuity = (nps_annuity_corpus * annuity_rate) / 12
+        total_nps_paid += nps_monthly_annuity
+        yield {
+            "Month": i + 1,
+            "Pension (₹)": round(nps_monthly_annuity, 2),
+            "Annuity Corpus (₹)": round(nps_annuity_corpus, 2),
+            "Cumulative Paid (₹)": round(total_nps_paid, 2)
+        }
+    return total_nps_paid
+
+
+def swp_outcome(lumpsum, swp_amount, swp_return_rate, months_swp):
+    # Months a systematic withdrawal plan lasts (up to months_swp), and the corpus left at the end
+    monthly_return = (1 + swp_return_rate) ** (1/12) - 1
+    corpus = lumpsum
+    months_corpus_lasts = 0
+    for _ in range(months_swp):
+        if corpus <= 0:
+            break
+        corpus = corpus * (1 + monthly_return) - swp_amount
+        months_corpus_lasts += 1
+    return months_corpus_lasts, corpus if corpus > 0 else 0
+
+
+def retirement_outcomes(inputs, final_state):
+    completed_six_months = career_timeline(inputs).service_months // 6
+    final_basic = final_state["basic_pay"]
+    nps_corpus = final_state["nps_corpus"]
+    ups_pension = 0.5 * final_basic
+    # DA% at retirement as shown in the progression table, e.g. 0.69 for 69%
+    last_da_pct = round(final_state["current_da"], 2)
+    months_retired = inputs.life_expectancy_years * 12
+    nps_annuity_amount = (nps_corpus * inputs.annuity_pct) * inputs.annuity_rate
+    return {
+        "ups_pension": ups_pension,
+        "last_da_pct": last_da_pct,
+        "nps_annuity_amount": nps_annuity_amount,
+        # UPS lumpsum (gratuity) as per new rule
+        "ups_lumpsum": final_basic * (completed_six_months / 10),
+        "nps_lumpsum": nps_corpus * (1 - inputs.annuity_pct),
+        "months_retired": months_retired,
+        # Total payouts over life expectancy
+        "total_ups_paid": float(ups_pension_schedule(ups_pension, last_da_pct, months_retired).sum()),
+        "total_nps_paid": nps_annuity_amount / 12 * months_retired,
+    }
+
+
+def evaluate_scenario(inputs, pay_matrix_full, unique_levels):
+    # Summary and trajectories only, small enough to keep per scenario in session state
+    df, final_state = simulate_career(inputs, pay_matrix_full, unique_levels)
+    outcomes = retirement_outcomes(inputs, final_state)
+    months_retired = outcomes["months_retired"]
+    return {
+        "summary": {
+            "NPS Corpus at Retirement (₹)": round(final_state["nps_corpus"]),
+            "Final Basic Pay (₹)": round(final_state["basic_pay"]),
+            "UPS Monthly Pension (₹)": round(outcomes["ups_pension"] * (1 + outcomes["last_da_pct"])),
+            "NPS Monthly Pension (₹)": round(outcomes["nps_annuity_amount"] / 12),
+            "UPS Lumpsum (₹)": round(outcomes["ups_lumpsum"]),
+            "NPS Lumpsum (₹)": round(outcomes["nps_lumpsum"]),
+            "Total UPS Pension (₹)": round(outcomes["total_ups_paid"]),
+            "Total NPS Annuity (₹)": round(outcomes["total_nps_paid"]),
+        },
+        "corpus": df["NPS Corpus"].to_numpy(),
+        "ups_pension": ups_pension_schedule(outcomes["ups_pension"], outcomes["last_da_pct"], months_retired),
+        "nps_pension": np.full(months_retired, outcomes["nps_annuity_amount"] / 12),
+    }
@@ -0,0 +1,207 @@
+# Streaming export of progression and payout tables for many scenarios
+
+import csv
+import gzip
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+
+import pandas as pd
+
+from engine import ScenarioInputs, check_inputs, iter_career, iter_nps_pension_rows, iter_ups_pension_rows, retirement_outcomes
+from paymatrix import check_pay_inputs
+
+# Rows buffered per table before a chunk is written; with three tables this keeps an export
+# within a few MB of the process baseline however many scenarios it holds
+EXPORT_CHUNK_ROWS = 5_000
+EXPORT_TABLES = ["career", "ups_pension", "nps_pension"]
+
+
+def export_formats():
+    # pyarrow is optional and only imported once a Parquet export is written
+    return ["csv", "parquet"] if importlib.util.find_spec("pyarrow") is not None else ["csv"]
+
+
+class _CsvChunkWriter:
+    extension = ".csv.gz"
+
+    def __init__(self, path):
+        self._file = gzip.open(path, "wt", newline="", encoding="utf-8")
+        self._writer = None
+
+    def write(self, rows):
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._file, fieldnames=list(rows[0]))
+            self._writer.writeheader()
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetChunkWriter:
+    extension = ".parquet"
+
+    def __init__(self, path):
+        self._path = path
+        self._writer = None
+
+    def write(self, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # Each chunk becomes one row group
+        table = pa.Table.from_pylist(rows, schema=self._writer.schema if self._writer else None)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._path, table.schema, compression="zstd")
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class _ChunkedTable:
+    def __init__(self, writer, chunk_rows):
+        self._writer = writer
+        self._chunk_rows = chunk_rows
+        self._buffer = []
+
+    def add_all(self, scenario, rows):
+        # Drains a row generator into the table and passes on the value it returns
+        while True:
+            try:
+                row = next(rows)
+            except StopIteration as stop:
+                return stop.value
+            self._buffer.append({"Scenario": scenario, **row})
+            if len(self._buffer) >= self._chunk_rows:
+                self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._writer.write(self._buffer)
+            self._buffer = []
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+
+def _jsonable(inputs):
+    return {k: v.isoformat() if hasattr(v, "isoformat") else v for k, v in inputs._asdict().items()}
+
+
+def _csv_value(field, value, default):
+    if isinstance(default, pd.Timestamp):
+        return pd.Timestamp(value)
+    if isinstance(default, int):
+        number = float(value)
+        if not number.is_integer():
+            raise ValueError(f"{field} must be a whole number, got {value!r}")
+        return int(number)
+    return type(default)(value)
+
+
+def iter_csv_scenarios(lines, defaults, max_positions):
+    """Scenarios from a CSV with one row per employee, read lazily.
+
+    Columns are ScenarioInputs field names, as in the export manifest, plus an optional
+    "Scenario" name; missing columns fall back to ``defaults``. Rates are fractions, except
+    pay_comm_pct, which is a whole percent (25 for 25%). Values outside the bounds of the
+    Dashboard inputs, or without a pay matrix cell, raise ValueError naming the row;
+    ``max_positions`` maps each level to its highest pay position.
+    """
+    for n, row in enumerate(csv.DictReader(lines), start=1):
+        name = (row.get("Scenario") or f"Row {n}").strip()
+        try:
+            values = {}
+            for field, default in defaults._asdict().items():
+                value = (row.get(field) or "").strip()
+                values[field] = _csv_value(field, value, default) if value else default
+            inputs = ScenarioInputs(**values)
+            check_inputs(inputs)
+            check_pay_inputs(inputs.pay_comm_pct, inputs.initial_level, inputs.initial_position, max_positions)
+        except ValueError as exc:
+            raise ValueError(f"Scenarios CSV row {n} ({name}): {exc}") from None
+        yield name, inputs
+
+
+def export_scenarios(scenarios, load_tables, fmt="csv", nps_annuity_growth_rate=0.0,
+                     chunk_rows=EXPORT_CHUNK_ROWS, directory=None):
+    """Write the career, UPS and NPS tables of every scenario into one zip archive.
+
+    ``scenarios`` is an iterable of (name, ScenarioInputs) and may be a generator; rows are
+    generated lazily and written in chunks of ``chunk_rows``, so memory stays flat however
+    many scenarios there are. Returns the archive path inside a fresh temporary directory,
+    which is removed again if writing fails.
+    """
+    workdir = tempfile.mkdtemp(prefix="ups_nps_export_", dir=directory)
+    try:
+        return _write_archive(workdir, scenarios, load_tables, fmt, nps_annuity_growth_rate, chunk_rows)
+    except BaseException:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise
+
+
+def prune_exports(directory, max_age):
+    # Removes exports written into ``directory`` more than ``max_age`` seconds ago
+    cutoff = time.time() - max_age
+    for entry in os.scandir(directory):
+        if entry.name.startswith("ups_nps_export_") and entry.stat().st_mtime < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def _write_archive(workdir, scenarios, load_tables, fmt, nps_annuity_growth_rate, chunk_rows):
+    writer_class = _ParquetChunkWriter if fmt == "parquet" else _CsvChunkWriter
+    parts = {name: os.path.join(workdir, name + writer_class.extension) for name in EXPORT_TABLES}
+    tables = {name: _ChunkedTable(writer_class(path), chunk_rows) for name, path in parts.items()}
+    manifest_path = os.path.join(workdir, "manifest.jsonl")
+
+    with open(manifest_path, "w", encoding="utf-8") as manifest:
+        manifest.write(json.dumps({
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "format": fmt,
+            "chunk_rows": chunk_rows,
+            "nps_annuity_growth_rate": nps_annuity_growth_rate,
+            "tables": [os.path.basename(path) for path in parts.values()],
+        }) + "\n")
+        try:
+            for scenario, inputs in scenarios:
+                pay_matrix_full, unique_levels = load_tables(inputs.pay_comm_pct)
+                final_state = tables["career"].add_all(scenario, iter_career(inputs, pay_matrix_full, unique_levels))
+                outcomes = retirement_outcomes(inputs, final_state)
+                months_retired = outcomes["months_retired"]
+                total_ups_paid = tables["ups_pension"].add_all(scenario, iter_ups_pension_rows(
+                    outcomes["ups_pension"], outcomes["last_da_pct"], months_retired
+                ))
+                total_nps_paid = tables["nps_pension"].add_all(scenario, iter_nps_pension_rows(
+                    final_state["nps_corpus"] * inputs.annuity_pct, inputs.annuity_rate,
+                    nps_annuity_growth_rate, months_retired,
+                ))
+                manifest.write(json.dumps({
+                    "scenario": scenario,
+                    "inputs": _jsonable(inputs),
+                    "nps_corpus": round(final_state["nps_corpus"], 2),
+                    "total_ups_paid": round(total_ups_paid, 2),
+                    "total_nps_paid": round(total_nps_paid, 2),
+                }, default=str) + "\n")
+        finally:
+            for table in tables.values():
+                table.close()
+
+    archive = os.path.join(workdir, "ups_nps_export.zip")
+    # Table parts are already compressed and are stored as-is; only the manifest is deflated
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_STORED) as zf:
+        zf.write(manifest_path, os.path.basename(manifest_path), compress_type=zipfile.ZIP_DEFLATED)
+        os.remove(manifest_path)
+        for path in parts.values():
+            if os.path.exists(path):
+                zf.write(path, os.path.basename(path))
+                os.remove(path)
+    return archive
@@ -0,0 +1,90 @@
+"""Cold-start import profile of the dashboard pages, checked against a budget.
+
+Imports every top-level module a page imports in a fresh interpreter under
+``python -X importtime`` and reports the slowest packages:
+
+    cd Dash
+    python importtime.py                       # all pages, default budget
+    python importtime.py pages/Dashboard.py --budget-ms 1500
+
+Exits non-zero when a page is over budget, or when an integration that must stay
+lazy (imported on first use only) is pulled in at startup.
+"""
+
+import argparse
+import ast
+import glob
+import os
+import subprocess
+import sys
+
+COLD_START_BUDGET_MS = 2000
+# Optional integrations that pages import on first use, never at module top. pyarrow is
+# deferred by export.py too, but recent pandas imports it on its own, so it is not checked.
+DEFERRED_MODULES = ["supabase", "gspread", "oauth2client"]
+
+
+def page_imports(path):
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def profile(modules):
+    # Returns {module: (self_us, cumulative_us)} for every module imported on a cold start
+    code = "; ".join(f"import {m}" for m in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def report(page, budget_ms, top):
+    modules = page_imports(page)
+    timings = profile(modules)
+    total_ms = sum(self_us for self_us, _ in timings.values()) / 1000
+    deferred = sorted(m for m in timings if any(m == d or m.startswith(d + ".") for d in DEFERRED_MODULES))
+    packages = {}
+    for name, (self_us, _) in timings.items():
+        root = name.split(".")[0]
+        packages[root] = packages.get(root, 0) + self_us
+
+    print(f"{page}: {total_ms:.0f} ms across {len(timings)} modules (budget {budget_ms} ms)")
+    for root, us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {us / 1000:8.1f} ms  {root}")
+    if deferred:
+        print(f"  imported at startup but should be deferred: {', '.join(deferred)}")
+    return total_ms <= budget_ms and not deferred
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pages", nargs="*", help="page scripts (default: about.py and pages/*.py)")
+    parser.add_argument("--budget-ms", type=float, default=COLD_START_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10, help="slowest packages to list")
+    args = parser.parse_args()
+
+    pages = [os.path.abspath(page) for page in args.pages]
+    # Pages import their helper modules from this directory
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    pages = pages or ["about.py"] + sorted(glob.glob(os.path.join("pages", "*.py")))
+    ok = all([report(page, args.budget_ms, args.top) for page in pages])
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
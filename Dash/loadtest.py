@@ -0,0 +1,251 @@
+"""Concurrent-session load test for the dashboard pages.
+
+Replays randomized widget sequences, with the odd scenario save and export, across many
+simulated sessions with Streamlit's AppTest, against the in-memory Supabase stub, and
+writes a JSON report:
+
+    cd Dash
+    python loadtest.py --sessions 100 --reruns 20 --processes 4 --out loadtest.json
+    python loadtest.py --sessions 100 --reruns 20 --baseline loadtest.json --out new.json
+
+Sessions in a process stay alive together and are rerun round-robin, so the report shows
+how memory grows with the number of open sessions as well as per-rerun latency. A session
+whose page raises is dead: it is not rerun again, and is reported and left out of the
+per-session figures.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+import supabase_stub
+from paymatrix import compact_pay_matrix
+
+PAGE = os.path.join("pages", "Dashboard.py")
+SECRETS = {"supabase_url": "http://localhost:54321", "supabase_key": "stub"}
+PERCENTILES = [50, 90, 95, 99]
+# Share of rerun steps that press a button instead of editing an input
+BUTTON_RATE = 0.1
+BUTTONS = ["Save Current Inputs", "Build Export"]
+LEVEL_LABEL = "Initial Pay Level"
+POSITION_LABEL = "Initial Pay Position"
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        # Peak rather than current RSS where /proc is unavailable (kB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def new_session(timeout):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(PAGE, default_timeout=timeout)
+    for key, value in SECRETS.items():
+        at.secrets[key] = value
+    return at
+
+
+def max_positions():
+    # Highest pay position of every level, so edits stay inside the pay matrix
+    pay_matrix = compact_pay_matrix(pd.read_excel("7cpclong.xlsx")).reset_index()
+    return pay_matrix.groupby("Level", observed=True)["Pay_Position"].max().to_dict()
+
+
+def widget_by_label(widgets, label):
+    return next(w for w in widgets if w.label == label)
+
+
+def random_edit(at, rng, positions):
+    # Picks one input widget on the current page and moves it to a random valid value
+    widgets = list(at.slider) + list(at.number_input) + list(at.selectbox)
+    widget = widgets[rng.randrange(len(widgets))]
+    # Sliders carry an empty options list; only selectboxes have choices
+    if getattr(widget, "options", None):
+        widget.set_value(widget.options[rng.randrange(len(widget.options))])
+        if widget.label == LEVEL_LABEL:
+            # Keep the current position valid for the new level
+            position = widget_by_label(at.number_input, POSITION_LABEL)
+            position.set_value(min(position.value, positions[int(widget.value)]))
+        return widget.label
+    low, high = widget.min, widget.max
+    if widget.label == POSITION_LABEL:
+        high = positions[int(widget_by_label(at.selectbox, LEVEL_LABEL).value)]
+    if high is None:
+        high = (widget.value or low) * 2
+    if isinstance(widget.value, int):
+        # Bounds come back as floats even for integer widgets
+        low, high, step = int(low), int(high), int(widget.step or 1)
+        value = low + step * rng.randrange((high - low) // step + 1)
+    else:
+        value = round(rng.uniform(low, high), 2)
+    widget.set_value(value)
+    return widget.label
+
+
+def random_step(at, rng, positions):
+    # Mostly input edits; now and then a button flow (saving a scenario, building an export)
+    buttons = [b for b in at.button if b.label in BUTTONS]
+    if buttons and rng.random() < BUTTON_RATE:
+        button = buttons[rng.randrange(len(buttons))]
+        button.click()
+        return button.label
+    return random_edit(at, rng, positions)
+
+
+def timed_run(at):
+    wall, cpu = time.perf_counter(), time.process_time()
+    at.run()
+    return (time.perf_counter() - wall) * 1000, (time.process_time() - cpu) * 1000, len(at.exception)
+
+
+def run_sessions(args):
+    sessions, reruns, seed, timeout = args
+    rng = random.Random(seed)
+    client = supabase_stub.install()
+    positions = max_positions()
+    rss_start = rss_mb()
+    apps, samples, rss_rounds, live_rounds = [], [], [], []
+
+    for _ in range(sessions):
+        at = new_session(timeout)
+        samples.append(("initial", *timed_run(at)))
+        apps.append(at)
+    rss_opened = rss_mb()
+
+    for _ in range(reruns):
+        for at in apps:
+            if at.exception:
+                continue
+            label = random_step(at, rng, positions)
+            samples.append((label, *timed_run(at)))
+        # Submissions are discarded so the stub table does not show up as growth
+        client.tables.clear()
+        rss_rounds.append(rss_mb())
+        live_rounds.append(sum(1 for at in apps if not at.exception))
+
+    return {
+        "sessions": sessions,
+        "samples": samples,
+        "dead_sessions": sum(1 for at in apps if at.exception),
+        "skipped_reruns": sessions * reruns - sum(1 for s in samples if s[0] != "initial"),
+        "rss_start_mb": rss_start,
+        "rss_opened_mb": rss_opened,
+        "rss_rounds_mb": rss_rounds,
+        "live_rounds": live_rounds,
+    }
+
+
+def summarize(values):
+    if not values:
+        return {}
+    values = np.asarray(values)
+    summary = {f"p{p}": round(float(np.percentile(values, p)), 2) for p in PERCENTILES}
+    summary["mean"] = round(float(values.mean()), 2)
+    summary["max"] = round(float(values.max()), 2)
+    return summary
+
+
+def git_version():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def build_report(results, config):
+    samples = [s for r in results for s in r["samples"]]
+    reruns = [s for s in samples if s[0] != "initial"]
+    per_session_mb = [
+        (r["rss_opened_mb"] - r["rss_start_mb"]) / r["sessions"] for r in results if r["sessions"]
+    ]
+    # Leak signal: RSS slope per round once every session is open, per session still being rerun
+    slopes = [
+        np.polyfit(np.arange(len(r["rss_rounds_mb"])), r["rss_rounds_mb"], 1)[0] / np.mean(r["live_rounds"])
+        for r in results if len(r["rss_rounds_mb"]) > 1 and min(r["live_rounds"]) > 0
+    ]
+    by_widget = {}
+    for label, wall, _, _ in reruns:
+        by_widget.setdefault(label, []).append(wall)
+    return {
+        "version": git_version(),
+        "python": platform.python_version(),
+        "config": config,
+        "reruns": len(reruns),
+        "errors": sum(1 for s in samples if s[3]),
+        "dead_sessions": sum(r["dead_sessions"] for r in results),
+        "skipped_reruns": sum(r["skipped_reruns"] for r in results),
+        "initial_run_ms": summarize([s[1] for s in samples if s[0] == "initial"]),
+        "rerun_ms": summarize([s[1] for s in reruns]),
+        "rerun_cpu_ms": summarize([s[2] for s in reruns]),
+        "rss_per_session_mb": round(float(np.mean(per_session_mb)), 3) if per_session_mb else None,
+        "rss_growth_per_session_per_rerun_mb": round(float(np.mean(slopes)), 4) if slopes else None,
+        "rss_peak_mb": round(max(max(r["rss_rounds_mb"] or [r["rss_opened_mb"]]) for r in results), 1),
+        "rerun_ms_by_widget": {label: summarize(v) for label, v in sorted(by_widget.items())},
+    }
+
+
+def compare(report, baseline):
+    rows = []
+    for section in ("initial_run_ms", "rerun_ms", "rerun_cpu_ms"):
+        for stat, value in report[section].items():
+            old = baseline.get(section, {}).get(stat)
+            if old:
+                rows.append(f"{section}.{stat}: {old} -> {value} ({(value - old) / old * 100:+.1f}%)")
+    for key in ("dead_sessions", "rss_per_session_mb", "rss_growth_per_session_per_rerun_mb", "rss_peak_mb"):
+        rows.append(f"{key}: {baseline.get(key)} -> {report.get(key)}")
+    return "\n".join(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50, help="simulated sessions in total")
+    parser.add_argument("--reruns", type=int, default=10, help="widget edits per session")
+    parser.add_argument("--processes", type=int, default=1, help="processes to spread the sessions over")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60, help="seconds allowed per rerun")
+    parser.add_argument("--out", default="loadtest_report.json")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    args = parser.parse_args()
+
+    args.out = os.path.abspath(args.out)
+    args.baseline = args.baseline and os.path.abspath(args.baseline)
+    # The page reads its spreadsheets relative to the working directory
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    processes = max(1, min(args.processes, args.sessions))
+    shares = [args.sessions // processes + (i < args.sessions % processes) for i in range(processes)]
+    jobs = [(n, args.reruns, args.seed + i, args.timeout) for i, n in enumerate(shares)]
+    if processes == 1:
+        results = [run_sessions(jobs[0])]
+    else:
+        with Pool(processes) as pool:
+            results = pool.map(run_sessions, jobs)
+
+    report = build_report(results, vars(args))
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    summary_keys = ("reruns", "errors", "dead_sessions", "skipped_reruns", "rerun_ms", "rss_per_session_mb")
+    print(json.dumps({k: report[k] for k in summary_keys}, indent=2))
+    if args.baseline:
+        with open(args.baseline) as f:
+            print(compare(report, json.load(f)))
+
+
+if __name__ == "__main__":
+    main()
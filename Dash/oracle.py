@@ -0,0 +1,448 @@
+"""Differential oracle for the simulation engine.
+
+``reference_run`` is a frozen copy of the original month-by-month loops of the
+Dashboard page (career progression, NPS recurrence, UPS/NPS payout tables and SWP),
+including its float pay matrices and DataFrame.query lookups. It must not be
+optimized or refactored: it is the definition of correct output.
+
+The fuzzer draws random valid inputs, stratified so every pay level and both
+increment months are covered, with positions at the edges of each level's range and
+joining dates clustered around CPC boundaries. It checks that an alternative engine
+reproduces the monthly tables and summary metrics within tolerance, and records the
+speedup per input:
+
+    cd Dash
+    python oracle.py --cases 500 --seed 1 --out oracle_report.jsonl
+    python oracle.py --engine mymodule:fast_run      # any fn(case, load_tables) -> result
+    python oracle.py --checkpoints                   # resume path the Dashboard page uses
+
+With ``--checkpoints`` every case runs through one shared CareerCheckpoints, followed by
+what-if edits of it (retirement age, pay commission increase, NPS return) that resume
+from the snapshots of earlier runs, each checked against a fresh reference run.
+"""
+
+import argparse
+import functools
+import importlib
+import json
+import random
+import sys
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from engine import (
+    CareerCheckpoints, ScenarioInputs, collect_rows, iter_nps_pension_rows, iter_ups_pension_rows, retirement_outcomes, simulate_career,
+    swp_outcome,
+)
+from paymatrix import (
+    BASE_CPC, CPC_YEARS, PAY_COMM_PCT_RANGE, compact_pay_matrix, pay_matrix_from_arrays, reference_arrays,
+    reference_levels, validate_pay_matrix,
+)
+
+RTOL = 1e-9
+# Absolute tolerance of the table columns compared numerically: amounts rounded to whole rupees
+# or paise may round a half-unit tie either way, DA rates only differ by float noise. Every
+# other column (Month, Year, Level, Position, CPC, Pay Commission Applied) must match exactly.
+TABLE_ATOL = {
+    "Basic Pay": 1.0,
+    "DA Amount": 1.0,
+    "Total Emoluments": 1.0,
+    "Monthly NPS Contribution": 1.0,
+    "NPS Corpus": 1.0,
+    "Pension (₹)": 0.01,
+    "Annuity Corpus (₹)": 0.01,
+    "Cumulative Paid (₹)": 0.01,
+    "DA Rate": 1e-9,
+    "DA Rate (%)": 1e-9,
+}
+SUMMARY_ATOL = 0.01
+SUMMARY_KEYS = [
+    "final_basic", "nps_corpus", "ups_pension", "last_da_pct", "nps_annuity_amount", "ups_lumpsum",
+    "nps_lumpsum", "total_ups_paid", "total_nps_paid", "months_corpus_lasts", "corpus_left_at_end",
+]
+TABLE_KEYS = ["df", "ups_pension_df", "nps_pension_df"]
+
+
+class Case(NamedTuple):
+    inputs: ScenarioInputs
+    nps_annuity_growth_rate: float
+    nps_reinvest_pct: float
+    swp_amount: int
+    swp_return_rate: float
+
+
+# --- Frozen reference: original page logic, do not edit ---
+
+def reference_load_data():
+    pay_matrix = pd.read_excel("7cpclong.xlsx")
+    da_table = pd.read_excel("DAtable.xlsx")
+    da_table['Date'] = pd.to_datetime(da_table['Date'])
+    pay_matrix['Pay_Position'] = pd.to_numeric(pay_matrix['Pay_Position'], errors='coerce')
+    pay_matrix['CPC'] = '7CPC'
+    pay_matrix=pay_matrix.dropna(subset="Basic_Pay")
+    return pay_matrix, da_table
+
+
+def reference_generate_cpc_tables(base_matrix, da_table, pay_comm_increase):
+    all_cpc_tables = [base_matrix.copy()]
+    cpc_years = CPC_YEARS.copy()
+    for cpc, cpc_start_year in cpc_years.items():
+        prev_cpc_table = all_cpc_tables[-1]
+        da_july_date = pd.Timestamp(f"{cpc_start_year-1}-07-01")
+        da_rate_row = da_table[da_table['Date'] <= da_july_date].sort_values('Date', ascending=False)
+        if not da_rate_row.empty:
+            da_rate = float(da_rate_row.iloc[0]['Rate'])
+        else:
+            da_rate = 0.0
+        fitment = (1 + da_rate) * (1 + pay_comm_increase)
+        new_table = prev_cpc_table.copy()
+        new_table['Basic_Pay'] = (new_table['Basic_Pay'] * fitment).round()
+        new_table['CPC'] = cpc
+        all_cpc_tables.append(new_table)
+    return pd.concat(all_cpc_tables, ignore_index=True)
+
+
+def reference_run(case, pay_matrix_full, unique_levels):
+    (joining_date, retirement_age, current_age, _, initial_level, initial_position, date_of_increment,
+     promotion_interval, nps_contribution_rate, nps_return, annuity_pct, annuity_rate, life_expectancy_years,
+     current_year) = case.inputs
+
+    retire_year = current_year + (retirement_age - current_age)
+    retire_date = datetime(retire_year, joining_date.month, joining_date.day)
+    months = pd.date_range(start=joining_date, end=retire_date, freq='MS')
+    service_months = (retire_date.year - joining_date.year) * 12 + (retire_date.month - joining_date.month)
+    completed_six_months = service_months // 6
+
+    records = []
+    level = initial_level
+    position = initial_position
+    current_cpc = BASE_CPC
+    cpc_years_sorted = [(BASE_CPC, joining_date.year)] + [(cpc, y) for cpc, y in CPC_YEARS.items()]
+    cpc_pointer = 0
+    basic_pay = pay_matrix_full.query("Level == @level and Pay_Position == @position and CPC == @current_cpc")['Basic_Pay'].values[0]
+    nps_corpus = 0.0
+    current_da = 0.0
+
+    for i, month in enumerate(months):
+        year = month.year
+        is_jan = month.month == 1
+        is_july = month.month == 7
+        pay_commission_applied = ""
+        if (cpc_pointer + 1 < len(cpc_years_sorted)) and (year == cpc_years_sorted[cpc_pointer + 1][1]) and is_jan:
+            cpc_pointer += 1
+            current_cpc = cpc_years_sorted[cpc_pointer][0]
+            pay_commission_applied = current_cpc
+            basic_pay_new = pay_matrix_full.query(
+             "Level == @level and Pay_Position == @position and CPC == @current_cpc"
+                )['Basic_Pay']
+            if not basic_pay_new.empty:
+                basic_pay = basic_pay_new.values[0]
+            current_da = 0.0
+        if is_jan or is_july:
+            current_da += 0.03
+        da_amt = basic_pay * current_da
+        total_emoluments = basic_pay + da_amt
+        if (date_of_increment == "January" and is_jan) or (date_of_increment == "July" and is_july):
+            next_position = position + 1
+            new_pay = pay_matrix_full.query("Level == @level and Pay_Position == @next_position and CPC == @current_cpc")['Basic_Pay']
+            if not new_pay.empty:
+                basic_pay = new_pay.values[0]
+                position = next_position
+        if ((year - joining_date.year) % promotion_interval == 0 and is_jan and year != joining_date.year):
+            current_index = unique_levels.index(level)
+            if current_index + 1 < len(unique_levels):
+                next_level = unique_levels[current_index + 1]
+                promoted_pay = pay_matrix_full.query("Level == @next_level and Pay_Position == 1 and CPC == @current_cpc")['Basic_Pay']
+                if not promoted_pay.empty:
+                    level = next_level
+                    basic_pay = promoted_pay.values[0]
+                    position = 1
+        monthly_contribution = total_emoluments * nps_contribution_rate
+        nps_corpus = (nps_corpus + monthly_contribution) * ((1 + nps_return) ** (1 / 12))
+        records.append({
+            "Month": month.strftime("%b-%Y"),
+            "Year": year,
+            "Level": level,
+            "Position": position,
+            "CPC": current_cpc,
+            "Basic Pay": round(basic_pay),
+            "DA Rate": round(current_da, 2),
+            "DA Amount": round(da_amt),
+            "Total Emoluments": round(total_emoluments),
+            "Monthly NPS Contribution": round(monthly_contribution),
+            "NPS Corpus": round(nps_corpus),
+            "Pay Commission Applied": pay_commission_applied
+        })
+
+    df = pd.DataFrame(records)
+    final_basic = basic_pay
+    ups_pension = 0.5 * final_basic
+    nps_annuity_amount = (nps_corpus * annuity_pct) * annuity_rate
+    last_da_pct = df.iloc[-1]['DA Rate']
+    ups_lumpsum = final_basic * (completed_six_months / 10)
+    nps_lumpsum = nps_corpus * (1 - annuity_pct)
+    months_retired = life_expectancy_years * 12
+
+    nps_lumpsum_swp = nps_lumpsum * case.nps_reinvest_pct
+    months_swp = life_expectancy_years * 12
+    monthly_return = (1 + case.swp_return_rate) ** (1/12) - 1
+    corpus = nps_lumpsum_swp
+    months_corpus_lasts = 0
+    for i in range(months_swp):
+        if corpus <= 0:
+            break
+        corpus = corpus * (1 + monthly_return) - case.swp_amount
+        months_corpus_lasts += 1
+    corpus_left_at_end = corpus if corpus > 0 else 0
+
+    ups_pension_rows = []
+    ups_monthly_pension = ups_pension
+    da_pct = last_da_pct
+    total_ups_paid = 0.0
+    for i in range(months_retired):
+        if i % 6 == 0 and i != 0:
+            da_pct += 0.03
+        month_pension = ups_monthly_pension * (1 + da_pct)
+        total_ups_paid += month_pension
+        ups_pension_rows.append({
+            "Month": i + 1,
+            "Pension (₹)": round(month_pension, 2),
+            "DA Rate (%)": round(da_pct * 100, 2),
+            "Cumulative Paid (₹)": round(total_ups_paid, 2)
+        })
+
+    nps_pension_rows = []
+    nps_annuity_corpus = nps_corpus * annuity_pct
+    total_nps_paid = 0.0
+    for i in range(months_retired):
+        nps_annuity_corpus = nps_annuity_corpus * (1 + case.nps_annuity_growth_rate / 12)
+        nps_monthly_annuity = (nps_annuity_corpus * annuity_rate) / 12
+        total_nps_paid += nps_monthly_annuity
+        nps_pension_rows.append({
+            "Month": i + 1,
+            "Pension (₹)": round(nps_monthly_annuity, 2),
+            "Annuity Corpus (₹)": round(nps_annuity_corpus, 2),
+            "Cumulative Paid (₹)": round(total_nps_paid, 2)
+        })
+
+    return {
+        "df": df,
+        "ups_pension_df": pd.DataFrame(ups_pension_rows),
+        "nps_pension_df": pd.DataFrame(nps_pension_rows),
+        "final_basic": final_basic,
+        "nps_corpus": nps_corpus,
+        "ups_pension": ups_pension,
+        "last_da_pct": last_da_pct,
+        "nps_annuity_amount": nps_annuity_amount,
+        "ups_lumpsum": ups_lumpsum,
+        "nps_lumpsum": nps_lumpsum,
+        "total_ups_paid": total_ups_paid,
+        "total_nps_paid": total_nps_paid,
+        "months_corpus_lasts": months_corpus_lasts,
+        "corpus_left_at_end": corpus_left_at_end,
+    }
+
+# --- End of frozen reference ---
+
+
+def engine_run(case, load_tables, checkpoints=None):
+    # The engine the Dashboard page uses, in the same shape as reference_run
+    inputs = case.inputs
+    pay_matrix_full, unique_levels = load_tables(inputs.pay_comm_pct)
+    df, final_state = simulate_career(inputs, pay_matrix_full, unique_levels, checkpoints)
+    outcomes = retirement_outcomes(inputs, final_state)
+    months_retired = outcomes["months_retired"]
+    ups_rows, total_ups_paid = collect_rows(
+        iter_ups_pension_rows(outcomes["ups_pension"], outcomes["last_da_pct"], months_retired)
+    )
+    nps_rows, total_nps_paid = collect_rows(iter_nps_pension_rows(
+        final_state["nps_corpus"] * inputs.annuity_pct, inputs.annuity_rate, case.nps_annuity_growth_rate,
+        months_retired,
+    ))
+    months_corpus_lasts, corpus_left_at_end = swp_outcome(
+        outcomes["nps_lumpsum"] * case.nps_reinvest_pct, case.swp_amount, case.swp_return_rate, months_retired
+    )
+    return {
+        "df": df,
+        "ups_pension_df": pd.DataFrame(ups_rows),
+        "nps_pension_df": pd.DataFrame(nps_rows),
+        "final_basic": final_state["basic_pay"],
+        "nps_corpus": final_state["nps_corpus"],
+        "ups_pension": outcomes["ups_pension"],
+        "last_da_pct": outcomes["last_da_pct"],
+        "nps_annuity_amount": outcomes["nps_annuity_amount"],
+        "ups_lumpsum": outcomes["ups_lumpsum"],
+        "nps_lumpsum": outcomes["nps_lumpsum"],
+        "total_ups_paid": total_ups_paid,
+        "total_nps_paid": total_nps_paid,
+        "months_corpus_lasts": months_corpus_lasts,
+        "corpus_left_at_end": corpus_left_at_end,
+    }
+
+
+def random_case(rng, index, levels, max_position, current_year):
+    # Cycles through every level and both increment months; the rest is drawn at random
+    level = levels[index % len(levels)]
+    date_of_increment = ["January", "July"][index // len(levels) % 2]
+    positions = max_position[level]
+    initial_position = rng.choice([1, positions, rng.randint(1, positions)])
+    if rng.random() < 0.5:
+        # Join in the December, January or July around a CPC switch
+        cpc_year = rng.choice(list(CPC_YEARS.values()))
+        year, month = rng.choice([(cpc_year - 1, 12), (cpc_year, 1), (cpc_year, 7)])
+    else:
+        year, month = rng.randint(2000, current_year + 10), rng.randint(1, 12)
+    joining_date = pd.Timestamp(year=year, month=month, day=rng.randint(1, 28))
+    age_at_joining = rng.randint(18, 40)
+    inputs = ScenarioInputs(
+        joining_date=joining_date,
+        retirement_age=rng.randint(58, 65),
+        current_age=age_at_joining + (current_year - year),
+        pay_comm_pct=rng.randint(PAY_COMM_PCT_RANGE.start, PAY_COMM_PCT_RANGE.stop - 1),
+        initial_level=level,
+        initial_position=initial_position,
+        date_of_increment=date_of_increment,
+        promotion_interval=rng.randint(2, 10),
+        nps_contribution_rate=rng.randint(10, 30) / 100,
+        nps_return=rng.randint(50, 120) / 10 / 100,
+        annuity_pct=rng.randint(40, 80) / 100,
+        annuity_rate=rng.randint(50, 80) / 10 / 100,
+        life_expectancy_years=rng.randint(1, 50),
+        current_year=current_year,
+    )
+    return Case(
+        inputs=inputs,
+        nps_annuity_growth_rate=rng.randint(0, 10) / 100,
+        nps_reinvest_pct=rng.randint(0, 100) / 100,
+        swp_amount=rng.randrange(1000, 200001, 1000),
+        swp_return_rate=rng.randint(5, 15) / 100,
+    )
+
+
+def what_if_cases(case, rng):
+    # Single-input edits a user makes after a first run; with checkpoints they resume mid-career
+    inputs = case.inputs
+    edits = {
+        "retirement_age": rng.choice([age for age in range(58, 66) if age != inputs.retirement_age]),
+        "pay_comm_pct": rng.choice([pct for pct in PAY_COMM_PCT_RANGE if pct != inputs.pay_comm_pct]),
+        "nps_return": rng.choice([r for r in range(50, 121) if r / 1000 != inputs.nps_return]) / 1000,
+    }
+    return [(field, case._replace(inputs=inputs._replace(**{field: value}))) for field, value in edits.items()]
+
+
+def mismatches(expected, actual):
+    problems = []
+    for key in TABLE_KEYS:
+        ref, alt = expected[key], actual[key]
+        if list(ref.columns) != list(alt.columns) or len(ref) != len(alt):
+            problems.append(f"{key}: shape {ref.shape} != {alt.shape} or columns differ")
+            continue
+        for column in ref.columns:
+            if column in TABLE_ATOL:
+                close = np.isclose(
+                    ref[column].to_numpy(float), alt[column].to_numpy(float), rtol=RTOL, atol=TABLE_ATOL[column]
+                )
+            else:
+                close = ref[column].to_numpy() == alt[column].to_numpy()
+            if not close.all():
+                row = int(np.argmin(close))
+                problems.append(f"{key}[{column}] row {row}: {ref[column].iloc[row]!r} != {alt[column].iloc[row]!r}")
+    for key in SUMMARY_KEYS:
+        if not np.isclose(float(expected[key]), float(actual[key]), rtol=RTOL, atol=SUMMARY_ATOL):
+            problems.append(f"{key}: {expected[key]!r} != {actual[key]!r}")
+    return problems
+
+
+def load_engine(spec):
+    module, _, function = spec.partition(":")
+    return getattr(importlib.import_module(module), function)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--current-year", type=int, default=datetime.now().year)
+    parser.add_argument("--engine", default="oracle:engine_run", help="module:function to check")
+    parser.add_argument("--checkpoints", action="store_true", help="check the checkpoint resume path")
+    parser.add_argument("--out", default="oracle_report.jsonl")
+    args = parser.parse_args()
+
+    alternative = load_engine(args.engine)
+    if args.checkpoints:
+        if args.engine != parser.get_default("engine"):
+            parser.error("--checkpoints checks the built-in engine; it cannot be combined with --engine")
+        alternative = functools.partial(engine_run, checkpoints=CareerCheckpoints(max_runs=64))
+    raw_matrix, da_table = reference_load_data()
+    arrays = reference_arrays(validate_pay_matrix(compact_pay_matrix(raw_matrix, BASE_CPC)), da_table)
+    unique_levels = sorted(raw_matrix['Level'].dropna().unique())
+    max_position = raw_matrix.groupby('Level')['Pay_Position'].max().astype(int).to_dict()
+
+    # Pay matrices are built once per percentage on both sides, so timings compare the loops only
+    reference_tables = lru_cache(maxsize=None)(
+        lambda pct: reference_generate_cpc_tables(raw_matrix, da_table, pct / 100)
+    )
+    engine_tables = lru_cache(maxsize=None)(
+        lambda pct: (pay_matrix_from_arrays(arrays, pct), reference_levels(arrays))
+    )
+
+    rng = random.Random(args.seed)
+    runs, failures, speedups = 0, 0, []
+    with open(args.out, "w") as out:
+        for index in range(args.cases):
+            case = random_case(rng, index, unique_levels, max_position, args.current_year)
+            checks = [(None, case)]
+            if args.checkpoints:
+                # Own generator per case, so the cases drawn match a run without --checkpoints
+                checks += what_if_cases(case, random.Random(f"{args.seed}:{index}"))
+            for what_if, checked in checks:
+                pay_matrix_full = reference_tables(checked.inputs.pay_comm_pct)
+                engine_tables(checked.inputs.pay_comm_pct)
+
+                start = time.perf_counter()
+                expected = reference_run(checked, pay_matrix_full, unique_levels)
+                reference_ms = (time.perf_counter() - start) * 1000
+                start = time.perf_counter()
+                try:
+                    actual = alternative(checked, engine_tables)
+                    problems = mismatches(expected, actual)
+                except Exception as exc:
+                    problems = [f"{type(exc).__name__}: {exc}"]
+                engine_ms = (time.perf_counter() - start) * 1000
+
+                speedup = reference_ms / engine_ms if engine_ms else float("inf")
+                speedups.append(speedup)
+                runs += 1
+                failures += bool(problems)
+                out.write(json.dumps({
+                    "case": index,
+                    "seed": args.seed,
+                    "what_if": what_if,
+                    "inputs": {
+                        k: str(v) if isinstance(v, pd.Timestamp) else v for k, v in checked.inputs._asdict().items()
+                    },
+                    "payout": {k: v for k, v in checked._asdict().items() if k != "inputs"},
+                    "ok": not problems,
+                    "mismatches": problems,
+                    "reference_ms": round(reference_ms, 3),
+                    "engine_ms": round(engine_ms, 3),
+                    "speedup": round(speedup, 2),
+                }, default=int) + "\n")
+                if problems:
+                    label = f" what-if {what_if}" if what_if else ""
+                    print(f"case {index}{label} (seed {args.seed}) failed: {problems[:3]}")
+
+    print(
+        f"{runs - failures}/{runs} runs match; speedup "
+        f"median {np.median(speedups):.1f}x, min {min(speedups):.1f}x, max {max(speedups):.1f}x"
+    )
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
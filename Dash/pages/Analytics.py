@@ -0,0 +1,40 @@
+# Submission analytics over the local mirror of UPS_Data
+
+import streamlit as st
+from clients import get_supabase_client
+from analytics import (
+    ANALYTICS_DB, connect, level_summary, nps_return_distribution, submission_count, sync_submissions,
+    watermark,
+)
+
+st.title("Submission Analytics")
+
+# At most one incremental sync per process every few minutes; readers only touch the rollups
+@st.cache_data(ttl=300, show_spinner="Syncing new submissions...")
+def sync():
+    return sync_submissions(get_supabase_client(), ANALYTICS_DB)
+
+if st.button("Sync Now"):
+    sync.clear()
+added = sync()
+
+conn = connect(ANALYTICS_DB)
+try:
+    summary = level_summary(conn)
+    returns = nps_return_distribution(conn)
+    last_id = watermark(conn)
+    total = submission_count(conn)
+finally:
+    conn.close()
+
+col1, col2, col3 = st.columns(3)
+col1.metric("Submissions", f"{total:,}")
+col2.metric("Added in Last Sync", f"{added:,}")
+col3.metric("Synced up to ID", f"{last_id:,}")
+
+st.subheader("UPS vs NPS Monthly Pension Gap by Pay Level")
+st.dataframe(summary)
+st.bar_chart(summary["Median UPS - NPS Gap (₹)"])
+
+st.subheader("Chosen NPS Annual Return Rate")
+st.bar_chart(returns)
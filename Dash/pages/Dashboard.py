@@ -4,40 +4,89 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta, date
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import json
-from supabase import create_client, Client
+import atexit
+import functools
+import io
+import itertools
+import os
+import shutil
+import tempfile
+from concurrent.futures import BrokenExecutor, ThreadPoolExecutor
+from clients import get_supabase_client
+from paymatrix import (
+    BASE_CPC, PAY_COMM_PCT_RANGE, compact_pay_matrix, pay_matrix_from_arrays, reference_arrays, reference_levels,
+    reference_params, reference_positions, validate_pay_matrix, validate_reference_arrays,
+)
+from sharedmem import publish_or_attach, shared_name
+from engine import (
+    CareerCheckpoints, ScenarioInputs, collect_rows, iter_nps_pension_rows, iter_ups_pension_rows, retirement_outcomes, simulate_career,
+    swp_outcome,
+)
+from scenarios import comparison_table, evaluate_scenarios, trajectory_frame
+from export import export_formats, export_scenarios, iter_csv_scenarios, prune_exports
+from annuity import (
+    UPS_FAMILY_PENSION_PCT, annuity_product_schedules, compare_with_ups, cumulative_payouts, ups_pension_schedule,
+)
 
 
 # Load Data
 st.title("Government Servant Pension Comparison: UPS vs NPS")
-CPC_YEARS = {
-    '8CPC': 2026,
-    '9CPC': 2036,
-    '10CPC': 2046,
-    '11CPC': 2056,
-}
-BASE_CPC = '7CPC'
-@st.cache_data
-def load_data():
+def build_reference_arrays():
     pay_matrix = pd.read_excel("7cpclong.xlsx")
     da_table = pd.read_excel("DAtable.xlsx")
     da_table['Date'] = pd.to_datetime(da_table['Date'])
-    pay_matrix['Pay_Position'] = pd.to_numeric(pay_matrix['Pay_Position'], errors='coerce')
-    pay_matrix['CPC'] = '7CPC'
-    pay_matrix=pay_matrix.dropna(subset="Basic_Pay")
-    return pay_matrix, da_table
+    pay_matrix = validate_pay_matrix(compact_pay_matrix(pay_matrix, BASE_CPC))
+    return reference_arrays(pay_matrix, da_table)
+
+# Reference data is immutable: held once per process (cache_resource does not copy it per session)
+# and shared with other processes on the host through shared memory.
+@st.cache_resource
+def load_data():
+    name = shared_name("7cpclong.xlsx", "DAtable.xlsx", params=reference_params())
+    return validate_reference_arrays(publish_or_attach(name, build_reference_arrays))
+
+@st.cache_resource
+def load_cpc_tables(pay_comm_pct):
+    return pay_matrix_from_arrays(load_data(), pay_comm_pct)
 
-pay_matrix, da_table = load_data()
-unique_levels = sorted(pay_matrix['Level'].dropna().unique())
+# One pool per server process. Threads, not spawned processes: under Streamlit the page is
+# __main__, and a spawned worker would run the whole page again, Supabase insert included.
+@st.cache_resource
+def scenario_pool():
+    return ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="scenario")
+
+def scenario_tables(pct):
+    return load_cpc_tables(pct), unique_levels
+
+# Career snapshots shared by all sessions, so late-career what-ifs resume instead of rerunning
+@st.cache_resource
+def career_checkpoints():
+    return CareerCheckpoints(max_runs=64)
+
+# Export archives wait on disk until they are downloaded, replaced or pruned
+EXPORT_MAX_AGE = 3600
+
+@st.cache_resource
+def export_directory():
+    path = tempfile.mkdtemp(prefix="ups_nps_exports_")
+    atexit.register(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+def read_archive(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+unique_levels = reference_levels(load_data())
 col1, col2,col3 = st.columns(3)
 with col1:
     st.subheader("Joining Details")
     joining_date = pd.to_datetime(st.date_input("Date of Joining", value=date(2016, 12, 13)))
     retirement_age = st.slider("Retirement Age", 58, 65, 60)
     current_age = st.slider("Current Age", 20, 60, 34)
-    pay_comm_increase = st.slider("Average Pay Commission Increase (%)", 10, 50, 25) / 100
+    pay_comm_pct = st.slider(
+        "Average Pay Commission Increase (%)", PAY_COMM_PCT_RANGE.start, PAY_COMM_PCT_RANGE.stop - 1, 25
+    )
+    pay_comm_increase = pay_comm_pct / 100
 with col2:
     st.subheader("Pay Details")
     initial_level = st.selectbox("Initial Pay Level", unique_levels)
@@ -52,25 +101,7 @@ with col3:
     annuity_rate = st.slider("Annual Annuity Rate (%)", 5.0, 8.0, 6.0) / 100
     life_expectancy_years = st.slider("Expected Years to Live Beyond Retirement", min_value=1, max_value=50, value=20)
 
-def generate_cpc_tables(base_matrix, da_table, pay_comm_increase):
-    all_cpc_tables = [base_matrix.copy()]
-    cpc_years = CPC_YEARS.copy()
-    prev_cpc = BASE_CPC
-    for cpc, cpc_start_year in cpc_years.items():
-        prev_cpc_table = all_cpc_tables[-1]
-        da_july_date = pd.Timestamp(f"{cpc_start_year-1}-07-01")
-        da_rate_row = da_table[da_table['Date'] <= da_july_date].sort_values('Date', ascending=False)
-        if not da_rate_row.empty:
-            da_rate = float(da_rate_row.iloc[0]['Rate'])
-        else:
-            da_rate = 0.0
-        fitment = (1 + da_rate) * (1 + pay_comm_increase)
-        new_table = prev_cpc_table.copy()
-        new_table['Basic_Pay'] = (new_table['Basic_Pay'] * fitment).round()
-        new_table['CPC'] = cpc
-        all_cpc_tables.append(new_table)
-    return pd.concat(all_cpc_tables, ignore_index=True)
-pay_matrix_full = generate_cpc_tables(pay_matrix, da_table, pay_comm_increase)
+pay_matrix_full = load_cpc_tables(pay_comm_pct)
 # Functions
 def create_new_cpc_matrix(old_matrix, da_table, new_cpc_base_year, pay_comm_increase, new_cpc):
     levels = old_matrix['Level'].unique()
@@ -91,116 +122,36 @@ def create_new_cpc_matrix(old_matrix, da_table, new_cpc_base_year, pay_comm_incr
 # User Inputs
 
 
-# --- Simulation Timeline ---
-retire_year = datetime.now().year + (retirement_age - current_age)
-retire_date = datetime(retire_year, joining_date.month, joining_date.day)
-months = pd.date_range(start=joining_date, end=retire_date, freq='MS')
-# Service duration
-service_months = (retire_date.year - joining_date.year) * 12 + (retire_date.month - joining_date.month)
-completed_six_months = service_months // 6
-
-
-
-# --- Main Calculation Loop ---
-records = []
-level = initial_level
-position = initial_position
-current_cpc = BASE_CPC
-cpc_years_sorted = [(BASE_CPC, joining_date.year)] + [(cpc, y) for cpc, y in CPC_YEARS.items()]
-cpc_pointer = 0
-basic_pay = pay_matrix_full.query("Level == @level and Pay_Position == @position and CPC == @current_cpc")['Basic_Pay'].values[0]
-nps_corpus = 0.0
-current_da = 0.0
-
-for i, month in enumerate(months):
-    year = month.year
-    is_jan = month.month == 1
-    is_july = month.month == 7
-    pay_commission_applied = ""
-
-    # Switch CPC if month/year matches new CPC cycle
-    if (cpc_pointer + 1 < len(cpc_years_sorted)) and (year == cpc_years_sorted[cpc_pointer + 1][1]) and is_jan:
-        cpc_pointer += 1
-        current_cpc = cpc_years_sorted[cpc_pointer][0]
-        pay_commission_applied = current_cpc
-        # Fetch new Basic Pay from the new CPC matrix
-        basic_pay_new = pay_matrix_full.query(
-         "Level == @level and Pay_Position == @position and CPC == @current_cpc"
-            )['Basic_Pay']
-        if not basic_pay_new.empty:
-            basic_pay = basic_pay_new.values[0]
-    # Reset DA after each CPC
-        current_da = 0.0
-
-    # DA increases every Jan and July at 3%
-    if is_jan or is_july:
-        current_da += 0.03
-
-    da_amt = basic_pay * current_da
-    total_emoluments = basic_pay + da_amt
-
-    # Increment
-    if (date_of_increment == "January" and is_jan) or (date_of_increment == "July" and is_july):
-        next_position = position + 1
-        new_pay = pay_matrix_full.query("Level == @level and Pay_Position == @next_position and CPC == @current_cpc")['Basic_Pay']
-        if not new_pay.empty:
-            basic_pay = new_pay.values[0]
-            position = next_position
-
-    # Promotion
-    if ((year - joining_date.year) % promotion_interval == 0 and is_jan and year != joining_date.year):
-        current_index = unique_levels.index(level)
-        if current_index + 1 < len(unique_levels):
-            next_level = unique_levels[current_index + 1]
-            promoted_pay = pay_matrix_full.query("Level == @next_level and Pay_Position == 1 and CPC == @current_cpc")['Basic_Pay']
-            if not promoted_pay.empty:
-                level = next_level
-                basic_pay = promoted_pay.values[0]
-                position = 1
-
-    # NPS corpus
-    monthly_contribution = total_emoluments * nps_contribution_rate
-    nps_corpus = (nps_corpus + monthly_contribution) * ((1 + nps_return) ** (1 / 12))
-
-    records.append({
-        "Month": month.strftime("%b-%Y"),
-        "Year": year,
-        "Level": level,
-        "Position": position,
-        "CPC": current_cpc,
-        "Basic Pay": round(basic_pay),
-        "DA Rate": round(current_da, 2),
-        "DA Amount": round(da_amt),
-        "Total Emoluments": round(total_emoluments),
-        "Monthly NPS Contribution": round(monthly_contribution),
-        "NPS Corpus": round(nps_corpus),
-        "Pay Commission Applied": pay_commission_applied
-    })
+# --- Simulation ---
+inputs = ScenarioInputs(
+    joining_date=joining_date,
+    retirement_age=retirement_age,
+    current_age=current_age,
+    pay_comm_pct=pay_comm_pct,
+    initial_level=initial_level,
+    initial_position=initial_position,
+    date_of_increment=date_of_increment,
+    promotion_interval=promotion_interval,
+    nps_contribution_rate=nps_contribution_rate,
+    nps_return=nps_return,
+    annuity_pct=annuity_pct,
+    annuity_rate=annuity_rate,
+    life_expectancy_years=life_expectancy_years,
+    current_year=datetime.now().year,
+)
+df, final_state = simulate_career(inputs, pay_matrix_full, unique_levels, career_checkpoints())
+outcomes = retirement_outcomes(inputs, final_state)
 
 # --- Final Outputs ---
-df = pd.DataFrame(records)
-final_basic = basic_pay
-ups_pension = 0.5 * final_basic
-nps_annuity_amount = (nps_corpus * annuity_pct) * annuity_rate
-# df is your progression DataFrame with all months until retirement
-last_da_pct = df.iloc[-1]['DA Rate']  # e.g., 0.69 for 69%
-# UPS lumpsum (gratuity) as per new rule
-ups_lumpsum = final_basic * (completed_six_months / 10)
-nps_lumpsum = nps_corpus * (1 - annuity_pct)
-# Total payouts over life expectancy
-months_retired = life_expectancy_years * 12
-ups_monthly_pension = ups_pension * (1)
-
-da_post_retire = last_da_pct  # Start from DA% at retirement!
-total_ups_paid = 0.0
-
-for i in range(months_retired):
-    if i % 6 == 0 and i != 0:
-        da_post_retire += 0.03
-    month_pension = ups_monthly_pension * (1 + da_post_retire)
-    total_ups_paid += month_pension
-nps_monthly_annuity = (nps_corpus * annuity_pct * annuity_rate) / 12
-total_nps_paid = nps_monthly_annuity * months_retired
+nps_corpus = final_state["nps_corpus"]
+ups_pension = outcomes["ups_pension"]
+last_da_pct = outcomes["last_da_pct"]
+nps_annuity_amount = outcomes["nps_annuity_amount"]
+ups_lumpsum = outcomes["ups_lumpsum"]
+nps_lumpsum = outcomes["nps_lumpsum"]
+months_retired = outcomes["months_retired"]
+total_ups_paid = outcomes["total_ups_paid"]
+total_nps_paid = outcomes["total_nps_paid"]
 
 # --- Results ---
 st.subheader("Monthly Pay Progression Table")
@@ -235,17 +186,7 @@ swp_return_rate = st.slider("Expected Annual Return on Reinvested Corpus (%)", 5
 
 nps_lumpsum_swp = nps_lumpsum * nps_reinvest_pct
 months_swp = life_expectancy_years * 12
-monthly_return = (1 + swp_return_rate) ** (1/12) - 1
-
-corpus = nps_lumpsum_swp
-months_corpus_lasts = 0
-for i in range(months_swp):
-    if corpus <= 0:
-        break
-    corpus = corpus * (1 + monthly_return) - swp_amount
-    months_corpus_lasts += 1
-
-corpus_left_at_end = corpus if corpus > 0 else 0
+months_corpus_lasts, corpus_left_at_end = swp_outcome(nps_lumpsum_swp, swp_amount, swp_return_rate, months_swp)
 years_corpus_lasts = months_corpus_lasts // 12
 months_extra = months_corpus_lasts % 12
 
@@ -268,39 +209,13 @@ nps_annuity_growth_rate = st.slider(
 ) / 100
 
 # --- UPS Pension Table ---
-ups_pension_rows = []
-ups_monthly_pension = ups_pension
-months_retired = life_expectancy_years * 12
-da_pct = last_da_pct
-total_ups_paid = 0.0
-for i in range(months_retired):
-    if i % 6 == 0 and i != 0:
-        da_pct += 0.03
-    month_pension = ups_monthly_pension * (1 + da_pct)
-    total_ups_paid += month_pension
-    ups_pension_rows.append({
-        "Month": i + 1,
-        "Pension (₹)": round(month_pension, 2),
-        "DA Rate (%)": round(da_pct * 100, 2),
-        "Cumulative Paid (₹)": round(total_ups_paid, 2)
-    })
+ups_pension_rows, total_ups_paid = collect_rows(iter_ups_pension_rows(ups_pension, last_da_pct, months_retired))
 ups_pension_df = pd.DataFrame(ups_pension_rows)
 
 # --- NPS Annuity Table ---
-nps_pension_rows = []
-nps_annuity_corpus = nps_corpus * annuity_pct
-nps_monthly_annuity = (nps_annuity_corpus * annuity_rate) / 12
-total_nps_paid = 0.0
-for i in range(months_retired):
-    nps_annuity_corpus = nps_annuity_corpus * (1 + nps_annuity_growth_rate / 12)
-    nps_monthly_annuity = (nps_annuity_corpus * annuity_rate) / 12
-    total_nps_paid += nps_monthly_annuity
-    nps_pension_rows.append({
-        "Month": i + 1,
-        "Pension (₹)": round(nps_monthly_annuity, 2),
-        "Annuity Corpus (₹)": round(nps_annuity_corpus, 2),
-        "Cumulative Paid (₹)": round(total_nps_paid, 2)
-    })
+nps_pension_rows, total_nps_paid = collect_rows(
+    iter_nps_pension_rows(nps_corpus * annuity_pct, annuity_rate, nps_annuity_growth_rate, months_retired)
+)
 nps_pension_df = pd.DataFrame(nps_pension_rows)
 
 # --- Display both tables ---
@@ -314,11 +229,98 @@ with col2:
     st.dataframe(nps_pension_df)
     st.markdown(f"**Total NPS Annuity Paid:** ₹{total_nps_paid:,.0f}")
 
-# Load credentials from Streamlit secrets
-url = st.secrets["supabase_url"]
-key = st.secrets["supabase_key"]
-# Connect to Supabase
-supabase: Client = create_client(url, key)
+# --- NPS Annuity Products vs UPS ---
+st.subheader("NPS Annuity Products vs UPS")
+col1, col2 = st.columns(2)
+with col1:
+    spouse_extra_years = st.slider("Spouse Survives Beyond You (Years)", 0, 30, 5)
+with col2:
+    annuity_step_up = st.slider("Increasing Annuity Step-up (% per year)", 1.0, 6.0, 3.0) / 100
+spouse_months = spouse_extra_years * 12
+product_cash_flows = annuity_product_schedules(
+    nps_corpus * annuity_pct, annuity_rate, months_retired, spouse_months, annuity_step_up
+)
+ups_schedule = ups_pension_schedule(ups_pension, last_da_pct, months_retired, spouse_months)
+st.dataframe(compare_with_ups(product_cash_flows, ups_schedule))
+st.line_chart(cumulative_payouts(product_cash_flows, ups_schedule))
+st.caption(
+    f"UPS includes {UPS_FAMILY_PENSION_PCT*100:.0f}% family pension for the spouse years."
+)
+
+# --- Scenario Workspace ---
+st.subheader("Scenario Workspace")
+saved_scenarios = st.session_state.setdefault("scenarios", {})
+scenario_results = st.session_state.setdefault("scenario_results", {})
+col1, col2 = st.columns([3, 1])
+with col1:
+    scenario_name = st.text_input("Scenario Name", value=f"Scenario {len(saved_scenarios) + 1}")
+with col2:
+    # Saving under an existing name replaces that variant; only it is recomputed
+    if st.button("Save Current Inputs") and scenario_name:
+        saved_scenarios[scenario_name] = inputs
+removed_scenarios = st.multiselect("Remove Scenarios", list(saved_scenarios))
+if removed_scenarios and st.button("Remove Selected"):
+    for name in removed_scenarios:
+        saved_scenarios.pop(name, None)
+
+if saved_scenarios:
+    try:
+        scenario_outputs = evaluate_scenarios(scenario_pool(), scenario_tables, saved_scenarios, scenario_results)
+    except BrokenExecutor:
+        # Never keep a dead pool cached; the next one starts fresh
+        scenario_pool.clear()
+        scenario_outputs = evaluate_scenarios(scenario_pool(), scenario_tables, saved_scenarios, scenario_results)
+    st.dataframe(comparison_table(saved_scenarios, scenario_outputs))
+    st.markdown("**NPS Corpus by Month of Service**")
+    st.line_chart(trajectory_frame(scenario_outputs, "corpus"))
+    st.markdown("**Monthly Pension after Retirement**")
+    st.line_chart(pd.concat([
+        trajectory_frame(scenario_outputs, "ups_pension").add_suffix(" (UPS)"),
+        trajectory_frame(scenario_outputs, "nps_pension").add_suffix(" (NPS)"),
+    ], axis=1))
+else:
+    st.info("Save the current inputs as a named scenario to compare variants side by side.")
+
+# --- Export ---
+st.subheader("Export Progression and Payout Tables")
+st.caption(
+    "Exports the current inputs, every saved scenario and, optionally, one scenario per row of an uploaded CSV. "
+    "CSV columns use the input names from the export manifest; missing columns take the current inputs. "
+    "Rates are fractions (0.08 for 8%), except pay_comm_pct, which is a whole percent (25 for 25%)."
+)
+col1, col2 = st.columns([1, 3])
+with col1:
+    export_format = st.radio("Format", export_formats(), format_func=lambda f: {"csv": "CSV (gzip)"}.get(f, "Parquet"))
+with col2:
+    employee_file = st.file_uploader("Scenarios CSV (one row per employee)", type="csv")
+if st.button("Build Export"):
+    # The previous export of this session is replaced; exports of abandoned sessions are pruned
+    previous = st.session_state.pop("export_archive", None)
+    if previous:
+        shutil.rmtree(os.path.dirname(previous), ignore_errors=True)
+    prune_exports(export_directory(), EXPORT_MAX_AGE)
+    export_list = itertools.chain([("Current Inputs", inputs)], saved_scenarios.items())
+    if employee_file is not None:
+        export_list = itertools.chain(export_list, iter_csv_scenarios(
+            io.TextIOWrapper(employee_file, encoding="utf-8"), inputs, reference_positions(load_data())
+        ))
+    try:
+        with st.spinner("Writing tables..."):
+            archive = export_scenarios(
+                export_list, scenario_tables, export_format, nps_annuity_growth_rate, directory=export_directory()
+            )
+    except ValueError as exc:
+        st.error(f"Export failed: {exc}")
+    else:
+        st.session_state["export_archive"] = archive
+archive = st.session_state.get("export_archive")
+if archive and os.path.exists(archive):
+    # The archive stays on disk and is read only when the button is clicked, so it is not
+    # held in memory for as long as the session lasts
+    st.download_button(
+        "Download Export (.zip)", functools.partial(read_archive, archive), file_name="ups_nps_export.zip",
+        mime="application/zip", on_click="ignore",
+    )
 
 # Example row to insert
 row = {
@@ -342,7 +344,8 @@ row = {
     # Add more fields as needed
 }
 
-data, count = supabase.table("UPS_Data").insert(row).execute()
+# Supabase client is created once per process, on the first write
+data, count = get_supabase_client().table("UPS_Data").insert(row).execute()
 
 
 
@@ -0,0 +1,138 @@
+# Pay matrix loading, CPC generation and lookups
+
+import numpy as np
+import pandas as pd
+
+CPC_YEARS = {
+    '8CPC': 2026,
+    '9CPC': 2036,
+    '10CPC': 2046,
+    '11CPC': 2056,
+}
+BASE_CPC = '7CPC'
+CPC_ORDER = [BASE_CPC] + list(CPC_YEARS)
+INDEX_COLUMNS = ['CPC', 'Level', 'Pay_Position']
+# Whole-percent values offered by the "Average Pay Commission Increase" slider
+PAY_COMM_PCT_RANGE = range(10, 51)
+# Bump whenever reference_arrays or generate_cpc_tables change what the arrays hold
+REFERENCE_VERSION = 1
+
+
+def _cpc_column(cpc, length):
+    return pd.Categorical([cpc] * length, categories=CPC_ORDER, ordered=True)
+
+
+def compact_pay_matrix(pay_matrix, cpc=BASE_CPC):
+    # int32 pay, int16 position, categorical Level/CPC, indexed by (CPC, Level, Pay_Position)
+    pay_matrix = pay_matrix.dropna(subset=['Basic_Pay'])
+    levels = sorted(pay_matrix['Level'].dropna().unique())
+    compact = pd.DataFrame({
+        'CPC': _cpc_column(cpc, len(pay_matrix)),
+        'Level': pd.Categorical(pay_matrix['Level'], categories=levels, ordered=True),
+        'Pay_Position': pd.to_numeric(pay_matrix['Pay_Position'], errors='coerce').astype(np.int16),
+        'Basic_Pay': pay_matrix['Basic_Pay'].round().astype(np.int32),
+    })
+    return compact.set_index(INDEX_COLUMNS).sort_index()
+
+
+def validate_pay_matrix(pay_matrix):
+    keys = pay_matrix.index
+    if keys.has_duplicates:
+        duplicated = keys[keys.duplicated()].unique().tolist()
+        raise ValueError(f"Duplicate pay matrix entries: {duplicated[:5]}")
+    positions = pd.Series(keys.get_level_values('Pay_Position'), index=keys.droplevel('Pay_Position'))
+    by_level = positions.groupby(level=['CPC', 'Level'], observed=True).agg(['min', 'max', 'count'])
+    gaps = by_level[(by_level['min'] != 1) | (by_level['max'] != by_level['count'])]
+    if not gaps.empty:
+        raise ValueError(f"Pay positions are not contiguous from 1 for {gaps.index.tolist()[:5]}")
+    return pay_matrix
+
+
+def lookup_basic_pay(pay_matrix_full, cpc, level, position):
+    # Returns None when the (CPC, Level, Pay_Position) cell does not exist
+    try:
+        return pay_matrix_full.at[(cpc, level, position), 'Basic_Pay']
+    except KeyError:
+        return None
+
+
+def generate_cpc_tables(base_matrix, da_table, pay_comm_increase):
+    all_cpc_tables = [base_matrix.reset_index()]
+    for cpc, cpc_start_year in CPC_YEARS.items():
+        prev_cpc_table = all_cpc_tables[-1]
+        da_july_date = pd.Timestamp(f"{cpc_start_year-1}-07-01")
+        da_rate_row = da_table[da_table['Date'] <= da_july_date].sort_values('Date', ascending=False)
+        if not da_rate_row.empty:
+            da_rate = float(da_rate_row.iloc[0]['Rate'])
+        else:
+            da_rate = 0.0
+        fitment = (1 + da_rate) * (1 + pay_comm_increase)
+        new_table = prev_cpc_table.copy()
+        new_table['Basic_Pay'] = (new_table['Basic_Pay'] * fitment).round().astype(np.int32)
+        new_table['CPC'] = _cpc_column(cpc, len(new_table))
+        all_cpc_tables.append(new_table)
+    return pd.concat(all_cpc_tables, ignore_index=True).set_index(INDEX_COLUMNS).sort_index()
+
+
+def reference_arrays(pay_matrix, da_table):
+    # Flat arrays of the base matrix and every generated matrix the slider can ask for; the DA
+    # timeline only enters through the fitment factors baked into the generated matrices
+    cpc_pay = np.stack([
+        generate_cpc_tables(pay_matrix, da_table, pct / 100)['Basic_Pay'].to_numpy().reshape(len(CPC_ORDER), -1)
+        for pct in PAY_COMM_PCT_RANGE
+    ])
+    return {
+        'level': np.asarray(pay_matrix.index.get_level_values('Level'), dtype=np.int16),
+        'position': pay_matrix.index.get_level_values('Pay_Position').to_numpy(np.int16),
+        'cpc_pay': cpc_pay,
+    }
+
+
+def reference_params():
+    # Everything besides the source spreadsheets that the reference arrays depend on
+    return (REFERENCE_VERSION, BASE_CPC, tuple(CPC_YEARS.items()), PAY_COMM_PCT_RANGE.start, PAY_COMM_PCT_RANGE.stop)
+
+
+def validate_reference_arrays(arrays):
+    expected = (len(PAY_COMM_PCT_RANGE), len(CPC_ORDER), len(arrays['level']))
+    if arrays['cpc_pay'].shape != expected:
+        raise ValueError(f"Reference pay matrices have shape {arrays['cpc_pay'].shape}, expected {expected}")
+    return arrays
+
+
+def reference_levels(arrays):
+    return np.unique(arrays['level']).tolist()
+
+
+def reference_positions(arrays):
+    # Highest pay position of every level
+    levels, positions = arrays['level'], arrays['position']
+    return {int(level): int(positions[levels == level].max()) for level in np.unique(levels)}
+
+
+def check_pay_inputs(pay_comm_pct, level, position, max_positions):
+    # Raises ValueError for inputs the pay matrices have no cells for
+    if pay_comm_pct not in PAY_COMM_PCT_RANGE:
+        raise ValueError(
+            f"pay_comm_pct must be a whole percent from {PAY_COMM_PCT_RANGE.start} to "
+            f"{PAY_COMM_PCT_RANGE.stop - 1}, got {pay_comm_pct}"
+        )
+    if level not in max_positions:
+        raise ValueError(f"initial_level {level} is not in the pay matrix")
+    if not 1 <= position <= max_positions[level]:
+        raise ValueError(f"initial_position must be from 1 to {max_positions[level]} for level {level}, got {position}")
+
+
+def pay_matrix_from_arrays(arrays, pay_comm_pct):
+    # Wraps the shared buffers without copying the pay values
+    if pay_comm_pct not in PAY_COMM_PCT_RANGE:
+        raise ValueError(f"No pay matrices for a {pay_comm_pct}% pay commission increase")
+    pay = arrays['cpc_pay'][pay_comm_pct - PAY_COMM_PCT_RANGE.start]
+    n_cpc, n_rows = pay.shape
+    levels = arrays['level']
+    index = pd.MultiIndex.from_arrays([
+        pd.Categorical.from_codes(np.repeat(np.arange(n_cpc), n_rows), categories=CPC_ORDER, ordered=True),
+        pd.Categorical(np.tile(levels, n_cpc), categories=np.unique(levels), ordered=True),
+        np.tile(arrays['position'], n_cpc),
+    ], names=INDEX_COLUMNS)
+    return pd.DataFrame({'Basic_Pay': pay.reshape(-1)}, index=index, copy=False)
@@ -0,0 +1,47 @@
+# Saved-scenario evaluation on a thread pool, against the shared reference data
+
+import pandas as pd
+
+from engine import evaluate_scenario
+
+
+def evaluate_scenarios(pool, load_tables, scenarios, results_cache):
+    """Evaluate saved scenarios on ``pool``, reusing ``results_cache`` (inputs -> result).
+
+    Only new or edited scenarios are submitted, and results of scenarios that are no longer
+    saved are dropped. ``load_tables(pay_comm_pct)`` returns (pay_matrix_full, unique_levels)
+    and is called in the calling thread, so pool threads never touch Streamlit caches.
+    """
+    pending = {
+        inputs: pool.submit(evaluate_scenario, inputs, *load_tables(inputs.pay_comm_pct))
+        for inputs in set(scenarios.values()) if inputs not in results_cache
+    }
+    for inputs, future in pending.items():
+        results_cache[inputs] = future.result()
+    live = set(scenarios.values())
+    for inputs in [key for key in results_cache if key not in live]:
+        del results_cache[inputs]
+    return {name: results_cache[inputs] for name, inputs in scenarios.items()}
+
+
+def comparison_table(scenarios, results):
+    rows = []
+    for name, inputs in scenarios.items():
+        rows.append({
+            "Scenario": name,
+            "Retirement Age": inputs.retirement_age,
+            "Initial Level": inputs.initial_level,
+            "Promotion Every (Years)": inputs.promotion_interval,
+            "Pay Commission Increase (%)": inputs.pay_comm_pct,
+            "NPS Return (%)": round(inputs.nps_return * 100, 2),
+            **results[name]["summary"],
+        })
+    return pd.DataFrame(rows).set_index("Scenario")
+
+
+def trajectory_frame(results, key):
+    # One column per scenario, aligned on month of service (or month after retirement)
+    frame = pd.DataFrame({name: pd.Series(result[key]) for name, result in results.items()})
+    frame.index = frame.index + 1
+    frame.index.name = "Month"
+    return frame
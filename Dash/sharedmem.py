@@ -0,0 +1,121 @@
+# Read-only NumPy arrays shared between processes through a named shared memory block
+
+import hashlib
+import json
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+_ALIGN = 64
+# Block layout: ready marker, header length, JSON header, aligned array data. The marker is
+# written last, so a block whose publisher is still writing (or died writing) is never read.
+_READY = b"UPSNPS02"
+_HEADER_START = 16
+# How long an attacher waits for a publisher that is still writing the block
+READY_TIMEOUT = 5.0
+# Keeps every mapped block alive for the lifetime of the process
+_blocks = {}
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def shared_name(*paths, params=(), prefix="ups_nps"):
+    # Name derived from the source files, the parameters the arrays are generated with and the
+    # block layout, so a process never attaches a block built from other data or other code
+    digest = hashlib.sha1(_READY)
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    digest.update(repr(params).encode())
+    return f"{prefix}_{digest.hexdigest()[:16]}"
+
+
+def _views(shm):
+    header_len = int.from_bytes(shm.buf[8:_HEADER_START], "little")
+    layout = json.loads(bytes(shm.buf[_HEADER_START:_HEADER_START + header_len]))
+    data_start = _aligned(_HEADER_START + header_len)
+    arrays = {}
+    for key, spec in layout.items():
+        view = np.ndarray(
+            tuple(spec["shape"]), np.dtype(spec["dtype"]), buffer=shm.buf, offset=data_start + spec["offset"]
+        )
+        view.flags.writeable = False
+        arrays[key] = view
+    return arrays
+
+
+def publish_arrays(name, arrays):
+    layout, size = {}, 0
+    for key, array in arrays.items():
+        size = _aligned(size)
+        layout[key] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": size}
+        size += array.nbytes
+    header = json.dumps(layout).encode()
+    data_start = _aligned(_HEADER_START + len(header))
+    shm = shared_memory.SharedMemory(name=name, create=True, size=data_start + max(size, 1))
+    shm.buf[8:_HEADER_START] = len(header).to_bytes(8, "little")
+    shm.buf[_HEADER_START:_HEADER_START + len(header)] = header
+    for key, array in arrays.items():
+        spec = layout[key]
+        np.ndarray(array.shape, array.dtype, buffer=shm.buf, offset=data_start + spec["offset"])[...] = array
+    shm.buf[:8] = _READY
+    _blocks[name] = shm
+    return _views(shm)
+
+
+def _open(name):
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    # Only the publisher should unlink the block when it exits. Before 3.13 attaching always
+    # registers the block, so it is unregistered again. Attachers are meant to be unrelated
+    # processes (other server processes on the host): a child spawned or forked by the
+    # publisher shares its tracker, and would drop the publisher's registration here.
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+def attach_arrays(name, timeout=READY_TIMEOUT):
+    # Raises FileNotFoundError when the block does not exist or is not ready within the timeout
+    shm = _blocks.get(name)
+    if shm is None:
+        shm = _open(name)
+        deadline = time.monotonic() + timeout
+        while bytes(shm.buf[:8]) != _READY:
+            if time.monotonic() > deadline:
+                shm.close()
+                raise FileNotFoundError(f"Shared memory block {name!r} was never completed")
+            time.sleep(0.01)
+        _blocks[name] = shm
+    return _views(shm)
+
+
+def _unlink(name):
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+def publish_or_attach(name, build):
+    try:
+        return attach_arrays(name)
+    except FileNotFoundError:
+        pass
+    arrays = build()
+    try:
+        return publish_arrays(name, arrays)
+    except FileExistsError:
+        pass
+    try:
+        return attach_arrays(name)
+    except FileNotFoundError:
+        # Left incomplete by a publisher that died while writing it
+        _unlink(name)
+    return publish_arrays(name, arrays)
@@ -0,0 +1,93 @@
+# In-memory stand-in for the supabase client, for load tests and offline runs
+
+import itertools
+import sys
+import threading
+import types
+from typing import NamedTuple, Optional
+
+
+class APIResponse(NamedTuple):
+    data: list
+    count: Optional[int] = None
+
+
+class StubQuery:
+    def __init__(self, table):
+        self._table = table
+        self._rows = None
+        self._filters = []
+        self._order = None
+        self._limit = None
+
+    def insert(self, row):
+        self._rows = row if isinstance(row, list) else [row]
+        return self
+
+    def select(self, *columns, count=None):
+        return self
+
+    def gt(self, column, value):
+        self._filters.append(lambda r: r.get(column) is not None and r[column] > value)
+        return self
+
+    def order(self, column, desc=False):
+        self._order = (column, desc)
+        return self
+
+    def limit(self, size):
+        self._limit = size
+        return self
+
+    def execute(self):
+        if self._rows is not None:
+            return APIResponse(self._table.insert(self._rows))
+        rows = [r for r in self._table.rows() if all(f(r) for f in self._filters)]
+        if self._order:
+            column, desc = self._order
+            rows.sort(key=lambda r: r[column], reverse=desc)
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        return APIResponse(rows)
+
+
+class StubTable:
+    def __init__(self):
+        self._rows = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def insert(self, rows):
+        with self._lock:
+            inserted = [{"id": next(self._ids), **row} for row in rows]
+            self._rows.extend(inserted)
+        return inserted
+
+    def rows(self):
+        with self._lock:
+            return [dict(r) for r in self._rows]
+
+
+class StubClient:
+    def __init__(self):
+        self.tables = {}
+
+    def table(self, name):
+        return StubQuery(self.tables.setdefault(name, StubTable()))
+
+
+_client = StubClient()
+
+
+def create_client(url, key):
+    # Every "connection" in the process sees the same tables, like a shared database
+    return _client
+
+
+def install():
+    # Makes `from supabase import create_client, Client` resolve to this stub
+    module = types.ModuleType("supabase")
+    module.create_client = create_client
+    module.Client = StubClient
+    sys.modules["supabase"] = module
+    return _client
@@ -0,0 +1,123 @@
+"""Check of the UPS_Data mirror sync against the in-memory Supabase stub.
+
+Inserts submissions, syncs, then inserts a row that commits late (an id below the
+watermark) and rows without a pension gap, and syncs twice more. After every sync the
+stored count, watermark and rollups are compared with direct queries over the
+mirrored rows:
+
+    cd Dash
+    python synccheck.py
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+import analytics
+from analytics import connect, submission_count, sync_submissions, watermark
+from supabase_stub import StubClient
+
+ROLLUP_CHECKS = {
+    "level_rollup": (
+        "SELECT level, n, ROUND(sum_gap, 4), ROUND(sum_ups, 4), ROUND(sum_nps, 4) FROM level_rollup ORDER BY level",
+        "SELECT initial_level, COUNT(*), ROUND(SUM(gap), 4), ROUND(SUM(ups_monthly_pension), 4), "
+        "ROUND(SUM(nps_monthly_pension), 4) FROM submissions WHERE gap IS NOT NULL "
+        "GROUP BY initial_level ORDER BY initial_level",
+    ),
+    "gap_histogram": (
+        "SELECT level, bucket, n FROM gap_histogram ORDER BY level, bucket",
+        "SELECT initial_level, gap_bucket, COUNT(*) FROM submissions WHERE gap IS NOT NULL "
+        "GROUP BY initial_level, gap_bucket ORDER BY initial_level, gap_bucket",
+    ),
+    "nps_return_counts": (
+        "SELECT nps_return_pct, n FROM nps_return_counts ORDER BY nps_return_pct",
+        "SELECT ROUND(nps_return * 100, 1), COUNT(*) FROM submissions WHERE nps_return IS NOT NULL "
+        "GROUP BY ROUND(nps_return * 100, 1) ORDER BY ROUND(nps_return * 100, 1)",
+    ),
+}
+
+
+def submission(rng, with_gap=True):
+    row = {
+        "Initial Pay Level": rng.randint(1, 18),
+        "Retirement Age": rng.randint(58, 65),
+        "NPS Annual Return Rate (%)": rng.randint(50, 120) / 1000,
+    }
+    if with_gap:
+        row["UPS Monthly Pension:"] = rng.uniform(20_000, 200_000)
+        row["NPS Monthly Pension (Estimated):"] = rng.uniform(10_000, 200_000)
+    return row
+
+
+def check(conn, expected_rows):
+    problems = []
+    count = conn.execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
+    if count != expected_rows:
+        problems.append(f"{count} rows mirrored, expected {expected_rows}")
+    if submission_count(conn) != count:
+        problems.append(f"submission_count {submission_count(conn)} != {count} rows")
+    max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM submissions").fetchone()[0]
+    if watermark(conn) != max_id:
+        problems.append(f"watermark {watermark(conn)} != highest id {max_id}")
+    for table, (stored, direct) in ROLLUP_CHECKS.items():
+        if conn.execute(stored).fetchall() != conn.execute(direct).fetchall():
+            problems.append(f"{table} does not match the mirrored rows")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2500, help="submissions before the first sync")
+    parser.add_argument("--batch-size", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    client = StubClient()
+    workdir = tempfile.mkdtemp(prefix="ups_nps_synccheck_")
+    path = os.path.join(workdir, "analytics.sqlite3")
+    problems = []
+
+    def sync(step, expected_added, expected_rows):
+        added = sync_submissions(client, path, batch_size=args.batch_size)
+        if added != expected_added:
+            problems.append(f"{step}: added {added}, expected {expected_added}")
+        conn = connect(path)
+        try:
+            problems.extend(f"{step}: {p}" for p in check(conn, expected_rows))
+        finally:
+            conn.close()
+        print(f"{step}: added {added}")
+
+    try:
+        # Ids are given explicitly, as Postgres hands them out; the id before last is still
+        # uncommitted at the first sync and only shows up after it
+        late_id = args.rows - 1
+        client.table(analytics.SOURCE_TABLE).insert([
+            {"id": i, **submission(rng)} for i in range(1, args.rows + 1) if i != late_id
+        ]).execute()
+        sync("initial sync", args.rows - 1, args.rows - 1)
+
+        next_id = args.rows + 1
+        client.table(analytics.SOURCE_TABLE).insert(
+            [{"id": late_id, **submission(rng)}]
+            + [{"id": next_id + i, **submission(rng, with_gap=False)} for i in range(5)]
+            + [{"id": next_id + 5, **submission(rng)}]
+        ).execute()
+        sync("late row and rows without a gap", 7, args.rows + 6)
+        sync("repeat sync", 0, args.rows + 6)
+    finally:
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        os.rmdir(workdir)
+
+    for problem in problems:
+        print(problem)
+    print("sync check passed" if not problems else f"{len(problems)} problems")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()